@@ -1,36 +1,98 @@
 import whisper
-import torch
 import os
 import re
+import time
 import argparse
+from asr_backends import ASR_BACKENDS, DECODE_PROFILES, FasterWhisperModel, decode_profile, transcribe_options
+from asr_prompt import PromptBuilder
+from batch_asr import PROMPT, file_segments, transcribe_corpus
+from model_registry import get_model, registry
+from streaming_asr import join_segments
+from vad import speech_segments
 
 
-def transcribe(audio: str, output_txt: str, prompt_on: bool) -> None:
+def transcribe(
+    audio: str,
+    output_txt: str,
+    prompt_on: bool,
+    asr_backend: str | None = None,
+    profile: str | None = None
+) -> None:
     """
     Transcribe the provided audio.
     :param audio: An audio file containing speech data.
     :param output_txt: An output txt in which the transcription will be written.
     :param prompt_on: If true, Whisper will be given an initial prompt.
+    :param asr_backend: A key of ASR_BACKENDS selecting the inference backend. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the model size and decoding options. Defaults to the
+        ASR_PROFILE setting.
     """
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    settings = decode_profile(profile)
+    model = get_model(settings['model_size'], backend=asr_backend)
 
-    model = whisper.load_model('medium').to(device)
+    # decode only the speech segments found by VAD instead of the whole file
+    waveform = whisper.load_audio(audio)
+    segments = []
 
-    transcription = model.transcribe(
-        audio=audio,
-        language='zh',
-        task='transcribe',
-        initial_prompt='我啱啱食完lunch，好飽啊。你今晚有冇興趣去party？We can go together.' if prompt_on else ''  # sample
-    )
+    # quiet speech can fall below the VAD threshold everywhere, so like trim_silence fall back to the whole file
+    for start, end in speech_segments(waveform) or [(0, len(waveform))]:
+        transcription = model.transcribe(
+            audio=waveform[start:end],
+            language='zh',
+            task='transcribe',
+            initial_prompt=PROMPT if prompt_on else '',
+            **transcribe_options(settings, model)
+        )
+        segments.append(transcription['text'].strip())
 
     with open(output_txt, 'a', newline='', encoding='utf-8') as f:
         audio_id = os.path.splitext(os.path.basename(audio))[0]
-        transcribed_text = transcription['text']
+        transcribed_text = join_segments(segments)
         f.write(f'{transcribed_text}\n')
 
     print(audio_id, transcribed_text)
 
 
+def transcribe_adaptive(
+    paths: list[str],
+    output_txt: str,
+    asr_backend: str | None = None,
+    profile: str | None = None
+) -> None:
+    """
+    Transcribe files in order as one conversation, prompting each file with the initial prompt preceded by the
+    code-switched terms of the transcriptions before it, as the app does.
+    :param paths: A list of audio file paths, in conversation order.
+    :param output_txt: An output txt in which the transcriptions will be written, one per line.
+    :param asr_backend: A key of ASR_BACKENDS selecting the inference backend. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the model size and decoding options. Defaults to the
+        ASR_PROFILE setting.
+    """
+    settings = decode_profile(profile)
+    model = get_model(settings['model_size'], backend=asr_backend)
+    builder = PromptBuilder()
+
+    for path in paths:
+        prompt = builder.prompt(PROMPT)
+        segments = [
+            model.transcribe(
+                audio=segment,
+                language='zh',
+                task='transcribe',
+                initial_prompt=list(prompt.tokens) if isinstance(model, FasterWhisperModel) else prompt.text,
+                **transcribe_options(settings, model)
+            )['text'].strip()
+            for segment in file_segments(path)
+        ]
+        transcribed_text = join_segments(segments)
+        builder.observe(transcribed_text)
+
+        with open(output_txt, 'a', newline='', encoding='utf-8') as f:
+            f.write(f'{transcribed_text}\n')
+
+        print(os.path.splitext(os.path.basename(path))[0], 'adaptive', transcribed_text)
+
+
 def numeric_sort(key: str) -> list:
     """
     Customized sorting so that file IDs can be sorted numerically instead of alphabetically.
@@ -65,22 +127,84 @@ if __name__ == '__main__':
         action='store_true',
         help='A boolean determining whether the transcriptions should be created with the initial prompt.'
     )
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='A boolean determining whether the transcriptions should be created with the conversation-aware prompt, '
+             'treating the files as one conversation in order.'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='An integer representing the number of worker processes, each with its own resident model.'
+    )
+    parser.add_argument(
+        '-b', '--batch-size',
+        type=int,
+        default=8,
+        help='An integer representing the number of files per worker task and of segments decoded in one batch.'
+    )
+    parser.add_argument(
+        '-a', '--asr-backend',
+        type=str,
+        default='whisper',
+        choices=list(ASR_BACKENDS),
+        help='A string representing the inference backend used to run the Whisper checkpoint.'
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default='balanced',
+        choices=list(DECODE_PROFILES),
+        help='A string representing the decoding profile: the model size, greedy or beam search, temperature fallback '
+             'and timestamp prediction.'
+    )
     args = parser.parse_args()
 
     directory = args.input_dir
     audio_files = os.listdir(directory)
     audio_files_sorted = sorted(audio_files, key=numeric_sort)
+    paths = [os.path.join(directory, audio_file) for audio_file in audio_files_sorted]
 
     filename = os.path.basename(directory)
 
+    # both passes share one audio decode and mel computation per file
+    passes = {}
     if args.unprompted:
-        out_file = os.path.join(args.output_dir, f'predicted_baseline_{filename}.txt')
-        for audio_file in audio_files_sorted:
-            path = os.path.join(directory, audio_file)
-            transcribe(path, out_file, prompt_on=False)
-
+        passes['baseline'] = None
     if args.prompted:
-        out_file = os.path.join(args.output_dir, f'predicted_prompted_{filename}.txt')
-        for audio_file in audio_files_sorted:
-            path = os.path.join(directory, audio_file)
-            transcribe(path, out_file, prompt_on=True)
+        passes['prompted'] = PROMPT
+
+    # non-default backends and profiles get their own output files so their CER/WER can be compared with
+    # evaluate_whisper.py
+    tag = '' if args.asr_backend == 'whisper' else f'{args.asr_backend}_'
+    tag += '' if args.profile == 'balanced' else f'{args.profile}_'
+    out_files = {name: os.path.join(args.output_dir, f'predicted_{name}_{tag}{filename}.txt') for name in passes}
+
+    start = time.perf_counter()
+
+    if passes:
+        transcriptions = transcribe_corpus(
+            paths, passes, workers=args.workers, batch_size=args.batch_size,
+            model_size=DECODE_PROFILES[args.profile]['model_size'], asr_backend=args.asr_backend, profile=args.profile
+        )
+        for path, transcription in zip(paths, transcriptions):
+            audio_id = os.path.splitext(os.path.basename(path))[0]
+            for name, transcribed_text in transcription.items():
+                with open(out_files[name], 'a', newline='', encoding='utf-8') as f:
+                    f.write(f'{transcribed_text}\n')
+                print(audio_id, name, transcribed_text)
+
+    if args.adaptive:
+        transcribe_adaptive(
+            paths, os.path.join(args.output_dir, f'predicted_adaptive_{tag}{filename}.txt'), args.asr_backend,
+            args.profile
+        )
+
+    elapsed = time.perf_counter() - start
+    files_per_second = len(paths) / elapsed if elapsed > 0 else 0.0
+    print(f'Transcribed {len(paths)} files in {elapsed:.1f}s ({files_per_second:.2f} files/sec)')
+
+    if args.workers <= 1:
+        print(registry.stats())
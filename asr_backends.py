@@ -0,0 +1,164 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+# torch and whisper are imported inside the loaders so that listing the backends stays cheap
+
+ASR_BACKENDS = {
+    'whisper': 'Whisper (PyTorch)',
+    'whisper-int8': 'Whisper int8 (PyTorch dynamic quantization)',
+    'faster-whisper': 'faster-whisper int8 (CTranslate2)'
+}
+
+# named decoding profiles trading accuracy for latency: model size, greedy or beam search, the temperatures tried in
+# turn when a decode fails Whisper's compression/log-probability checks, and timestamp prediction
+DECODE_PROFILES = {
+    'realtime': {
+        'label': 'Realtime (small, greedy, no fallback)',
+        'model_size': 'small',
+        'beam_size': None,
+        'best_of': None,
+        'temperature': (0.0,),
+        'condition_on_previous_text': False,
+        'without_timestamps': True
+    },
+    'balanced': {
+        'label': 'Balanced (medium, greedy)',
+        'model_size': 'medium',
+        'beam_size': None,
+        'best_of': None,
+        'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': False,
+        'without_timestamps': True
+    },
+    'accurate': {
+        'label': 'Accurate (medium, beam search)',
+        'model_size': 'medium',
+        'beam_size': 5,
+        'best_of': 5,
+        'temperature': (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        'condition_on_previous_text': True,
+        'without_timestamps': False
+    }
+}
+
+
+def decode_profile(name: str | None = None) -> dict:
+    """
+    Look up a decoding profile.
+    :param name: A key of DECODE_PROFILES. Defaults to the ASR_PROFILE environment variable, or 'balanced'.
+    :return: The profile's settings.
+    """
+    return DECODE_PROFILES[name or os.getenv('ASR_PROFILE', 'balanced')]
+
+
+def transcribe_options(profile: dict, model) -> dict:
+    """
+    Build the decoding keyword arguments of a `transcribe` call for a profile.
+    :param profile: A value of DECODE_PROFILES.
+    :param model: The model that will run the call, used to enable fp16 only on CUDA.
+    :return: A dict of keyword arguments accepted by both openai-whisper and FasterWhisperModel.
+    """
+    return {
+        'beam_size': profile['beam_size'],
+        'best_of': profile['best_of'],
+        'temperature': profile['temperature'],
+        'condition_on_previous_text': profile['condition_on_previous_text'],
+        'without_timestamps': profile['without_timestamps'],
+        'fp16': model.device.type == 'cuda'
+    }
+
+
+class Device(NamedTuple):
+    """
+    The device a faster-whisper model runs on, exposing the `type` attribute that callers read from torch.device
+    without importing torch.
+    """
+    type: str
+
+
+class FasterWhisperModel:
+    """
+    Adapter exposing a faster-whisper model through the same `transcribe` call and result shape as openai-whisper.
+    """
+
+    def __init__(self, size: str, device: str, compute_type: str = 'int8'):
+        """
+        :param size: A string corresponding to the Whisper model size, e.g. 'medium'.
+        :param device: A string corresponding to the device, e.g. 'cpu' or 'cuda'.
+        :param compute_type: The CTranslate2 compute type, e.g. 'int8' or 'int8_float16'.
+        """
+        try:
+            from faster_whisper import WhisperModel
+            from faster_whisper.utils import download_model
+        except ImportError as error:
+            raise ImportError('The faster-whisper ASR backend requires the faster-whisper package.') from error
+
+        model_path = download_model(size)
+        self.model = WhisperModel(model_path, device=device, compute_type=compute_type)
+        self.device = Device(device.split(':')[0])
+
+        # weights are stored as float16 and held as int8 when quantized
+        weights_mb = os.path.getsize(os.path.join(model_path, 'model.bin')) / (1024 ** 2)
+        self.size_mb = weights_mb / 2 if compute_type.startswith('int8') else weights_mb
+
+    def transcribe(self, audio: str | np.ndarray, language: str | None = None, task: str = 'transcribe',
+                   initial_prompt: str | list[int] | None = None, fp16: bool | None = None, **options) -> dict:
+        """
+        Transcribe audio with faster-whisper.
+        :param audio: An audio file path or a float32 waveform sampled at 16 kHz.
+        :param language: A string corresponding to the spoken language, e.g. 'zh'.
+        :param task: A string corresponding to the task: 'transcribe' or 'translate'.
+        :param initial_prompt: A prompt string or a list of prompt token IDs.
+        :param fp16: Ignored; precision is set by the compute type.
+        :param options: Decoding options such as `beam_size` and `temperature`. None means greedy, as in openai-whisper.
+        :return: A dict containing the text, segments, and detected language, like openai-whisper's result.
+        """
+        # faster-whisper defaults to a beam of 5, while openai-whisper treats a missing beam size as greedy decoding
+        for name in ('beam_size', 'best_of'):
+            if name in options and options[name] is None:
+                options[name] = 1
+
+        segments, info = self.model.transcribe(
+            audio, language=language, task=task, initial_prompt=initial_prompt or None, **options
+        )
+        segments = [{'start': s.start, 'end': s.end, 'text': s.text} for s in segments]
+        return {'text': ''.join(s['text'] for s in segments), 'segments': segments, 'language': info.language}
+
+
+def quantize_whisper(model):
+    """
+    Apply PyTorch dynamic int8 quantization to the linear layers of a CPU Whisper model.
+    :param model: A Whisper model loaded on the CPU.
+    :return: The quantized model.
+    """
+    import torch
+    import whisper
+
+    # whisper's Linear subclass only adds a dtype cast, which is a no-op in fp32 on the CPU
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_asr_model(size: str, device: str, backend: str = 'whisper'):
+    """
+    Load a Whisper checkpoint with the requested inference backend.
+    :param size: A string corresponding to the Whisper model size, e.g. 'medium'.
+    :param device: A string corresponding to the device, e.g. 'cpu' or 'cuda'.
+    :param backend: A key of ASR_BACKENDS.
+    :return: A model with a `transcribe` method compatible with openai-whisper.
+    """
+    import whisper
+
+    if backend == 'whisper':
+        return whisper.load_model(size, device=device)
+    if backend == 'whisper-int8':
+        if device != 'cpu':
+            raise ValueError('PyTorch dynamic quantization is only supported on the CPU.')
+        return quantize_whisper(whisper.load_model(size, device='cpu'))
+    if backend == 'faster-whisper':
+        return FasterWhisperModel(size, device, compute_type='int8' if device == 'cpu' else 'int8_float16')
+    raise ValueError(f'Unknown ASR backend: {backend}')
@@ -0,0 +1,129 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+# Whisper keeps at most n_text_ctx // 2 - 1 = 223 prompt tokens; the default leaves headroom because Whisper
+# re-tokenizes prompt text as a whole, which can take a few more tokens than the cached pieces
+MAX_PROMPT_TOKENS = int(os.getenv('ASR_PROMPT_MAX_TOKENS', '200'))
+
+# code-switched terms remembered per conversation
+MAX_TERMS = 100
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """
+    A Whisper initial prompt as text and as the token IDs it was budgeted with.
+    """
+    text: str
+    tokens: tuple[int, ...]
+
+
+@lru_cache(maxsize=1)
+def tokenizer():
+    """
+    Load Whisper's multilingual tokenizer, shared by the small and medium checkpoints.
+    :return: The tokenizer.
+    """
+    from whisper.tokenizer import get_tokenizer
+
+    return get_tokenizer(multilingual=True, language='zh', task='transcribe')
+
+
+@lru_cache(maxsize=8192)
+def encode(piece: str) -> tuple[int, ...]:
+    """
+    Tokenize one piece of a prompt. Pieces are cached, so a term is only tokenized the first time it is seen.
+    :param piece: The text to tokenize, including its leading space.
+    :return: The token IDs.
+    """
+    return tuple(tokenizer().encode(piece))
+
+
+def code_switched_terms(text: str) -> list[str]:
+    """
+    Find the English terms of a code-switched Cantonese message, e.g. 'lunch' in '我啱啱食完lunch'.
+    :param text: A transcription or typed message.
+    :return: A list of English words of at least three characters, in order. Empty if the text has no Cantonese.
+    """
+    # imported on first use, since evaluate_whisper also imports the scoring libraries
+    from evaluate_whisper import split_lang
+
+    cantonese, english = split_lang(text)
+    if not cantonese:
+        return []
+    return [word for word in english.split() if len(word) >= 3 and not word.isdigit()]
+
+
+class PromptBuilder:
+    """
+    Builds a conversation-aware Whisper prompt: the script's sample sentence, preceded by the code-switched terms used
+    most recently in the conversation, within Whisper's prompt token budget. The sample sentence comes last so that it
+    stays closest to the audio and keeps setting the script and style.
+
+    Terms are tokenized once and the finished prompt is cached until a message brings in a new term, so transcribing
+    a message costs no tokenization.
+    """
+
+    def __init__(self, max_tokens: int = MAX_PROMPT_TOKENS, max_terms: int = MAX_TERMS):
+        """
+        :param max_tokens: The maximum number of prompt tokens.
+        :param max_terms: The number of distinct terms remembered.
+        """
+        self.max_tokens = max_tokens
+        self.max_terms = max_terms
+        # lowercased term -> term as last written, most recently used last
+        self._terms = OrderedDict()
+        self._prompts = {}
+        self._lock = threading.Lock()
+
+    def observe(self, text: str) -> None:
+        """
+        Add the terms of a new message. Only this message is parsed.
+        :param text: The message's transcription or typed text.
+        """
+        terms = code_switched_terms(text)
+        if not terms:
+            return
+
+        with self._lock:
+            for term in terms:
+                self._terms.pop(term.lower(), None)
+                self._terms[term.lower()] = term
+            while len(self._terms) > self.max_terms:
+                self._terms.popitem(last=False)
+            self._prompts.clear()
+
+    def prompt(self, base: str) -> Prompt:
+        """
+        Fetch the prompt for the conversation so far.
+        :param base: The sample sentence of the selected script, e.g. a value of engine.ASR_PROMPTS.
+        :return: The prompt, rebuilt only if a new term has arrived since it was last built.
+        """
+        with self._lock:
+            prompt = self._prompts.get(base)
+            if prompt is None:
+                prompt = self._prompts[base] = self._build(base)
+            return prompt
+
+    def _build(self, base: str) -> Prompt:
+        """
+        Assemble a prompt from the cached tokens of the base sentence and of as many recent terms as fit.
+        """
+        base_tokens = encode(' ' + base.strip())
+        budget = self.max_tokens - len(base_tokens)
+
+        pieces = []
+        for term in reversed(self._terms.values()):
+            tokens = encode(f' {term},')
+            if len(tokens) > budget:
+                break
+            budget -= len(tokens)
+            pieces.append((term, tokens))
+        pieces.reverse()
+
+        text = ' '.join([f'{term},' for term, _ in pieces] + [base.strip()])
+        tokens = tuple(token for _, piece in pieces for token in piece) + base_tokens
+        return Prompt(text, tokens)
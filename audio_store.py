@@ -0,0 +1,169 @@
+import hashlib
+import os
+import shutil
+import struct
+import threading
+
+import numpy as np
+
+from audio_utils import ffmpeg_decode, ffmpeg_encode, float32_to_pcm16
+
+# one index record per stored clip: message ID, offset into the segment file and length, both in samples, and the
+# conversation's tag. A record with a negative length marks the message's clip as deleted
+INDEX_RECORD = struct.Struct('<qqqQ')
+
+FORMATS = ('pcm16', 'flac')
+
+
+class AudioStore:
+    """
+    Archive of the 16 kHz mono speech behind stored messages, keyed by Message.id, so that history can be transcribed
+    again with another model or prompt without anyone speaking again.
+
+    In the default 'pcm16' format, clips are appended as int16 samples to a single segment file and located through
+    an append-only offset index; reads are zero-copy slices of a memory map of the segment file. The 'flac' format
+    instead stores one losslessly compressed file per message through ffmpeg, at roughly half the size.
+
+    Every clip also records the conversation it belongs to, and is only returned for that conversation, so a clip
+    never resurfaces under a message that later reuses its ID. A store directory must only be written by one process at
+    a time.
+    """
+
+    def __init__(self, directory: str, format: str = 'pcm16'):
+        """
+        :param directory: The directory holding the store. It is created if missing.
+        :param format: 'pcm16' or 'flac'.
+        """
+        if format not in FORMATS:
+            raise ValueError(f'Unknown audio store format {format!r}, expected one of {FORMATS}')
+
+        self.directory = directory
+        self.format = format
+        self.segment_path = os.path.join(directory, 'audio.pcm16')
+        self.index_path = os.path.join(directory, 'audio.index')
+        self._lock = threading.Lock()
+        self._map = None
+        os.makedirs(directory, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict[int, tuple[int, int, int]]:
+        """
+        Read the offset index. Later records win, so a message stored twice resolves to its latest audio.
+        :return: A dict mapping message IDs to (offset, length, conversation tag), lengths in samples.
+        """
+        index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+            # a trailing partial record is left by a crash mid-write and is ignored
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for message_id, offset, length, tag in INDEX_RECORD.iter_unpack(data[:usable]):
+                if length < 0:
+                    index.pop(message_id, None)
+                else:
+                    index[message_id] = (offset, length, tag)
+        return index
+
+    @staticmethod
+    def _tag(conversation_id: str) -> int:
+        return int.from_bytes(hashlib.blake2b(conversation_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _flac_dir(self, conversation_id: str) -> str:
+        return os.path.join(self.directory, f'{self._tag(conversation_id):016x}')
+
+    def _flac_path(self, message_id: int, conversation_id: str) -> str:
+        return os.path.join(self._flac_dir(conversation_id), f'{message_id}.flac')
+
+    def put(self, message_id: int, conversation_id: str, audio: np.ndarray) -> None:
+        """
+        Store the audio of a message.
+        :param message_id: The ID of the stored Message.
+        :param conversation_id: The conversation the message belongs to.
+        :param audio: A float32 waveform sampled at 16 kHz.
+        """
+        if self.format == 'flac':
+            data = ffmpeg_encode(audio, 'flac')
+            os.makedirs(self._flac_dir(conversation_id), exist_ok=True)
+            with open(self._flac_path(message_id, conversation_id), 'wb') as f:
+                f.write(data)
+            return
+
+        pcm = float32_to_pcm16(audio)
+        with self._lock:
+            with open(self.segment_path, 'ab') as f:
+                offset = f.tell() // pcm.itemsize
+                f.write(pcm.tobytes())
+            # the index record is written only once its samples are on disk
+            with open(self.index_path, 'ab') as f:
+                f.write(INDEX_RECORD.pack(message_id, offset, len(pcm), self._tag(conversation_id)))
+            self._index[message_id] = (offset, len(pcm), self._tag(conversation_id))
+
+    def get(self, message_id: int, conversation_id: str) -> np.ndarray | None:
+        """
+        Load the audio of a message.
+        :param message_id: The ID of the stored Message.
+        :param conversation_id: The conversation the message belongs to.
+        :return: A float32 waveform sampled at 16 kHz, or None if no audio was stored for the message in this
+            conversation.
+        """
+        if self.format == 'flac':
+            path = self._flac_path(message_id, conversation_id)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'rb') as f:
+                return ffmpeg_decode(f.read())
+
+        with self._lock:
+            location = self._index.get(message_id)
+            if location is None or location[2] != self._tag(conversation_id):
+                return None
+            offset, length, _ = location
+            # remap once the segment file has grown past the current mapping
+            if self._map is None or len(self._map) < offset + length:
+                self._map = np.memmap(self.segment_path, dtype='<i2', mode='r')
+            samples = self._map[offset:offset + length]
+
+        return samples.astype(np.float32) / 32768.0
+
+    def delete(self, conversation_id: str, message_ids: list[int]) -> None:
+        """
+        Delete the audio of a conversation's messages. In the 'pcm16' format the samples stay in the segment file, but
+        the clips can no longer be read.
+        :param conversation_id: The conversation the messages belong to.
+        :param message_ids: The IDs of the deleted Messages.
+        """
+        if self.format == 'flac':
+            shutil.rmtree(self._flac_dir(conversation_id), ignore_errors=True)
+            return
+
+        tag = self._tag(conversation_id)
+        with self._lock:
+            deleted = [message_id for message_id in message_ids if self._index.get(message_id, (0, 0, None))[2] == tag]
+            with open(self.index_path, 'ab') as f:
+                f.write(b''.join(INDEX_RECORD.pack(message_id, 0, -1, tag) for message_id in deleted))
+            for message_id in deleted:
+                del self._index[message_id]
+
+    def __contains__(self, key: tuple[int, str]) -> bool:
+        """
+        Check whether audio is stored for a (message ID, conversation ID) pair.
+        """
+        message_id, conversation_id = key
+        if self.format == 'flac':
+            return os.path.exists(self._flac_path(message_id, conversation_id))
+        location = self._index.get(message_id)
+        return location is not None and location[2] == self._tag(conversation_id)
+
+    def __len__(self) -> int:
+        if self.format == 'flac':
+            return sum(
+                name.endswith('.flac') for _, _, names in os.walk(self.directory) for name in names
+            )
+        return len(self._index)
+
+
+# archiving is off unless AUDIO_STORE_DIR is set
+audio_store = (
+    AudioStore(os.environ['AUDIO_STORE_DIR'], os.getenv('AUDIO_STORE_FORMAT', 'pcm16'))
+    if os.getenv('AUDIO_STORE_DIR') else None
+)
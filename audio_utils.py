@@ -0,0 +1,119 @@
+import io
+import subprocess
+import wave
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    """
+    Convert raw 16-bit PCM bytes into the float32 waveform Whisper expects.
+    :param data: Raw little-endian int16 audio bytes, e.g. from a PyAudio stream.
+    :return: A float32 NumPy array scaled to [-1.0, 1.0).
+    """
+    return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def resample(audio: np.ndarray, orig_rate: int, target_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Resample a waveform, low-pass filtering first when downsampling to avoid aliasing.
+    :param audio: A float32 waveform.
+    :param orig_rate: The sample rate of the waveform.
+    :param target_rate: The sample rate to convert to.
+    :return: The resampled float32 waveform, or the input unchanged if the rates already match.
+    """
+    if orig_rate == target_rate or len(audio) == 0:
+        return audio
+
+    if orig_rate > target_rate:
+        # windowed-sinc low-pass at the new Nyquist frequency
+        cutoff = 0.5 * target_rate / orig_rate
+        taps = np.arange(101) - 50
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(101)
+        audio = np.convolve(audio, kernel / kernel.sum(), mode='same')
+
+    duration = len(audio) / orig_rate
+    positions = np.arange(int(duration * target_rate)) * (orig_rate / target_rate)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def ffmpeg_decode(data: bytes) -> np.ndarray:
+    """
+    Decode arbitrary audio bytes through ffmpeg over pipes. Only used for inputs the WAV reader cannot handle.
+    :param data: The encoded audio bytes.
+    :return: A mono float32 waveform sampled at 16 kHz.
+    """
+    command = ['ffmpeg', '-nostdin', '-i', 'pipe:0', '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1']
+    output = subprocess.run(command, input=data, capture_output=True, check=True).stdout
+    return pcm16_to_float32(output)
+
+
+def wav_bytes_to_float32(data: bytes) -> np.ndarray:
+    """
+    Decode WAV bytes, e.g. from an upload, straight into the waveform Whisper expects without touching the disk.
+    :param data: The bytes of a WAV file.
+    :return: A mono float32 waveform sampled at 16 kHz.
+    """
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wf:
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            rate = wf.getframerate()
+            frames = wf.readframes(wf.getnframes())
+    except (wave.Error, EOFError):
+        return ffmpeg_decode(data)
+
+    if sample_width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128.0
+    elif sample_width == 2:
+        audio = pcm16_to_float32(frames)
+    elif sample_width == 4:
+        audio = np.frombuffer(frames, dtype=np.int32).astype(np.float32) / 2147483648.0
+    else:
+        return ffmpeg_decode(data)
+
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+
+    return resample(audio, rate)
+
+
+def float32_to_pcm16(audio: np.ndarray) -> np.ndarray:
+    """
+    Convert a float32 waveform into 16-bit PCM samples, the inverse of pcm16_to_float32.
+    :param audio: A float32 waveform scaled to [-1.0, 1.0).
+    :return: A little-endian int16 NumPy array.
+    """
+    return (np.clip(audio, -1.0, 32767 / 32768) * 32768).astype('<i2')
+
+
+def ffmpeg_encode(audio: np.ndarray, format: str = 'flac') -> bytes:
+    """
+    Encode a 16 kHz mono waveform through ffmpeg over pipes, e.g. into FLAC for archiving.
+    :param audio: A float32 waveform sampled at 16 kHz.
+    :param format: The ffmpeg output format, e.g. 'flac' or 'ogg'.
+    :return: The encoded audio bytes, which ffmpeg_decode reads back.
+    """
+    command = [
+        'ffmpeg', '-nostdin', '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-i', 'pipe:0', '-f', format, 'pipe:1'
+    ]
+    return subprocess.run(command, input=float32_to_pcm16(audio).tobytes(), capture_output=True, check=True).stdout
+
+
+def float32_to_wav_bytes(audio: np.ndarray, rate: int = SAMPLE_RATE) -> bytes:
+    """
+    Encode a waveform as 16-bit mono WAV bytes, e.g. to send it to the translation service.
+    :param audio: A float32 waveform scaled to [-1.0, 1.0).
+    :param rate: The sample rate of the waveform.
+    :return: The bytes of a WAV file.
+    """
+    pcm = float32_to_pcm16(audio)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+    return buffer.getvalue()
@@ -0,0 +1,164 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+
+import numpy as np
+import torch
+import whisper
+
+from asr_backends import decode_profile, transcribe_options
+from model_registry import get_model
+from streaming_asr import join_segments
+from vad import speech_segments
+
+PROMPT = '我啱啱食完lunch，好飽啊。你今晚有冇興趣去party？We can go together.'  # sample
+
+
+def file_segments(path: str) -> list[np.ndarray]:
+    """
+    Decode an audio file once and split it into speech segments.
+    :param path: A string corresponding to the path of the audio file.
+    :return: A list of float32 waveforms, one per speech segment of at most 30 seconds.
+    """
+    waveform = whisper.load_audio(path)
+    # quiet speech can fall below the VAD threshold everywhere, so like trim_silence fall back to the whole file, cut
+    # into 30-second windows
+    segments = speech_segments(waveform) or [
+        (start, min(start + whisper.audio.N_SAMPLES, len(waveform)))
+        for start in range(0, len(waveform), whisper.audio.N_SAMPLES)
+    ]
+    return [waveform[start:end] for start, end in segments]
+
+
+def segment_mels(segments: list[np.ndarray], n_mels: int) -> torch.Tensor:
+    """
+    Compute the log-mel features of a file's speech segments.
+    :param segments: A list of float32 waveforms of at most 30 seconds.
+    :param n_mels: The number of mel bins the model expects.
+    :return: A tensor of shape (segments, n_mels, 3000) with each segment padded to 30 seconds.
+    """
+    mels = [whisper.log_mel_spectrogram(whisper.pad_or_trim(segment), n_mels=n_mels) for segment in segments]
+    return torch.stack(mels) if mels else torch.zeros(0, n_mels, whisper.audio.N_FRAMES)
+
+
+def transcribe_group(
+    paths: list[str],
+    passes: dict[str, str | None],
+    batch_size: int,
+    model_size: str = 'medium',
+    asr_backend: str | None = None,
+    profile: str | None = None
+) -> list[dict[str, str]]:
+    """
+    Transcribe a group of files with padded batched decoding, sharing audio decoding and mel features across passes.
+    :param paths: A list of audio file paths.
+    :param passes: A dict mapping each pass name to its initial prompt, or None for no prompt.
+    :param batch_size: The number of 30-second segments decoded together.
+    :param model_size: A string corresponding to the Whisper model size.
+    :param asr_backend: A key of ASR_BACKENDS. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the decoding options. Batched decoding has no temperature
+        fallback, so only the profile's first temperature is used. Defaults to the ASR_PROFILE setting.
+    :return: A list with one dict per file mapping each pass name to its transcription.
+    """
+    model = get_model(model_size, backend=asr_backend)
+    settings = decode_profile(profile)
+    per_file_segments = [file_segments(path) for path in paths]
+
+    # backends other than PyTorch Whisper have no batched mel decoding, so they decode one segment at a time
+    if not isinstance(model, whisper.Whisper):
+        return [
+            {
+                name: join_segments([
+                    model.transcribe(
+                        segment, language='zh', task='transcribe', initial_prompt=prompt,
+                        **transcribe_options(settings, model)
+                    )['text'].strip()
+                    for segment in segments
+                ])
+                for name, prompt in passes.items()
+            }
+            for segments in per_file_segments
+        ]
+
+    per_file = [segment_mels(segments, model.dims.n_mels) for segments in per_file_segments]
+    mels = torch.cat(per_file).to(model.device)
+
+    results = []
+    for name, prompt in passes.items():
+        options = whisper.DecodingOptions(
+            language='zh',
+            task='transcribe',
+            prompt=prompt,
+            temperature=settings['temperature'][0],
+            beam_size=settings['beam_size'],
+            # best_of only applies when sampling
+            best_of=settings['best_of'] if settings['temperature'][0] > 0 else None,
+            without_timestamps=settings['without_timestamps'],
+            fp16=model.device.type == 'cuda'
+        )
+        texts = []
+        for i in range(0, len(mels), batch_size):
+            texts.extend(result.text.strip() for result in whisper.decode(model, mels[i:i + batch_size], options))
+        results.append((name, texts))
+
+    transcriptions = []
+    offset = 0
+    for mel in per_file:
+        transcriptions.append({name: join_segments(texts[offset:offset + len(mel)]) for name, texts in results})
+        offset += len(mel)
+
+    return transcriptions
+
+
+def _transcribe_group_star(args: tuple) -> list[dict[str, str]]:
+    """
+    Unpack arguments for transcribe_group inside a pool worker.
+    """
+    return transcribe_group(*args)
+
+
+def _init_worker(model_size: str, asr_backend: str | None) -> None:
+    """
+    Load the worker's resident model once when the process starts.
+    :param model_size: A string corresponding to the Whisper model size.
+    :param asr_backend: A key of ASR_BACKENDS.
+    """
+    get_model(model_size, backend=asr_backend)
+
+
+def transcribe_corpus(
+    paths: list[str],
+    passes: dict[str, str | None],
+    workers: int = 1,
+    batch_size: int = 8,
+    model_size: str = 'medium',
+    asr_backend: str | None = None,
+    profile: str | None = None
+) -> Iterator[dict[str, str]]:
+    """
+    Transcribe a corpus of audio files, optionally fanning groups of files out across a process pool in which every
+    worker keeps its own resident model. Results are yielded in the same order as `paths`.
+    :param paths: A list of audio file paths.
+    :param passes: A dict mapping each pass name to its initial prompt, or None for no prompt.
+    :param workers: The number of worker processes. 1 transcribes in the current process.
+    :param batch_size: The number of files per group and of 30-second segments decoded together.
+    :param model_size: A string corresponding to the Whisper model size.
+    :param asr_backend: A key of ASR_BACKENDS. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the decoding options. Defaults to the ASR_PROFILE setting.
+    :return: An iterator of dicts, one per file, mapping each pass name to its transcription.
+    """
+    groups = [
+        (paths[i:i + batch_size], passes, batch_size, model_size, asr_backend, profile)
+        for i in range(0, len(paths), batch_size)
+    ]
+
+    if workers <= 1:
+        for group in groups:
+            yield from _transcribe_group_star(group)
+        return
+
+    # spawn rather than fork so every worker can initialize CUDA on its own
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, context, _init_worker, (model_size, asr_backend)) as pool:
+        for transcriptions in pool.map(_transcribe_group_star, groups):
+            yield from transcriptions
@@ -0,0 +1,96 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = [
+    'streamlit',
+    'database',
+    'translation_cache',
+    'translation_backend',
+    'streaming_asr',
+    'pipeline',
+    'engine',
+    'openai',
+    'torch',
+    'whisper',
+    'model_registry'
+]
+
+APP_SCRIPT = '''
+import sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file('translate.py', default_timeout=600)
+start = time.perf_counter()
+app.run()
+first = time.perf_counter() - start
+start = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - start
+print(first, rerun, 'torch' in sys.modules, 'whisper' in sys.modules)
+'''
+
+
+def time_import(module: str) -> float:
+    """
+    Measure how long importing a module takes in a fresh interpreter.
+    :param module: The name of the module to import.
+    :return: The import time in seconds.
+    """
+    code = f'import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)'
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def time_app() -> dict:
+    """
+    Run the Streamlit app headlessly in a fresh interpreter and time its first run and a rerun.
+    :return: A dict containing both timings and whether torch and Whisper were imported by a text-only session.
+    """
+    output = subprocess.run([sys.executable, '-c', APP_SCRIPT], capture_output=True, text=True, check=True).stdout
+    first, rerun, torch_loaded, whisper_loaded = output.strip().splitlines()[-1].split()
+    return {
+        'first_run_s': float(first),
+        'rerun_s': float(rerun),
+        'torch_imported': torch_loaded == 'True',
+        'whisper_imported': whisper_loaded == 'True'
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='bench_startup.py',
+        description='Measures import times and Streamlit cold-start time of the app.'
+    )
+    parser.add_argument(
+        '-r', '--repeats',
+        type=int,
+        default=3,
+        help='An integer representing the number of fresh interpreters used per measurement.'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        default=None,
+        help='A string representing the name of a .json file to write the results to.'
+    )
+    args = parser.parse_args()
+
+    results = {'imports_s': {}, 'app': []}
+
+    for module in MODULES:
+        results['imports_s'][module] = statistics.median(time_import(module) for _ in range(args.repeats))
+        print(f'import {module}: {results["imports_s"][module]:.3f}s')
+
+    for _ in range(args.repeats):
+        results['app'].append(time_app())
+    first_run = statistics.median(run['first_run_s'] for run in results['app'])
+    rerun = statistics.median(run['rerun_s'] for run in results['app'])
+    print(f'app first run: {first_run:.3f}s, rerun: {rerun:.3f}s')
+    print(f'torch imported: {results["app"][0]["torch_imported"]}, '
+          f'whisper imported: {results["app"][0]["whisper_imported"]}')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,435 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+# database.py reads DATABASE_URL on import, so the benchmark points it at a scratch database first unless it is set
+os.environ.setdefault(
+    'DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='benchmark-'), 'benchmark.db')}"
+)
+
+from audio_utils import wav_bytes_to_float32
+from compare_backends import percentile
+from database import init_db
+from engine import ASR_PROMPTS, asr_model, create_pipeline, transcribe_audio
+from pipeline import Job
+from stub_openai import start_stub_server
+from translation_cache import translation_cache
+
+SCRIPT = 'Traditional 繁體字'
+USER_1_LANGUAGE = 'Cantonese 粵語'
+USER_2_LANGUAGE = 'English 英文'
+
+
+def summarize(values: list[float]) -> dict:
+    """
+    Summarize a list of latencies.
+    :param values: A list of measurements in seconds.
+    :return: A dict containing the count, mean, p50, p95, p99 and maximum.
+    """
+    if not values:
+        return {'n': 0}
+    return {
+        'n': len(values),
+        'mean': sum(values) / len(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'max': max(values)
+    }
+
+
+def peak_rss_mb() -> float:
+    """
+    Report the peak resident set size of this process so far.
+    :return: The peak RSS in megabytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 ** 2) if sys.platform == 'darwin' else peak / 1024
+
+
+def load_corpus(audio_dir: str | None, texts_txt: str | None) -> tuple[list[bytes], list[str]]:
+    """
+    Read the benchmark corpus into memory so that disk reads are not part of any measurement.
+    :param audio_dir: A directory of .wav files, or None.
+    :param texts_txt: A .txt file containing one message per line, or None.
+    :return: A tuple containing the WAV files' bytes and the text messages.
+    """
+    wav_files = []
+    if audio_dir:
+        for name in sorted(os.listdir(audio_dir)):
+            if name.lower().endswith('.wav'):
+                with open(os.path.join(audio_dir, name), 'rb') as f:
+                    wav_files.append(f.read())
+
+    texts = []
+    if texts_txt:
+        with open(texts_txt, 'r', encoding='utf-8') as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    return wav_files, texts
+
+
+def bench_asr(wav_files: list[bytes], asr_backend: str | None, repeats: int) -> dict[str, list[float]]:
+    """
+    Time the ASR path stage by stage on every file.
+    :param wav_files: A list of WAV files' bytes.
+    :param asr_backend: A key of ASR_BACKENDS.
+    :param repeats: The number of passes over the files.
+    :return: A dict mapping each stage to its latencies: audio decode and full transcription, plus log-mel, encoder and
+    decoder for PyTorch Whisper models.
+    """
+    import torch
+    import whisper
+
+    model = asr_model(asr_backend)
+    device = getattr(model, 'device', torch.device('cpu'))
+
+    def sync() -> None:
+        if device.type == 'cuda':
+            torch.cuda.synchronize()
+
+    fp16 = device.type == 'cuda'
+    latencies = {'audio_decode': [], 'transcribe': []}
+    layered = isinstance(model, whisper.Whisper)
+    if layered:
+        latencies.update({'mel': [], 'encode': [], 'decode': []})
+        options = whisper.DecodingOptions(language='zh', task='transcribe', prompt=ASR_PROMPTS[SCRIPT], fp16=fp16)
+
+    for _ in range(repeats):
+        for data in wav_files:
+            start = time.perf_counter()
+            audio = wav_bytes_to_float32(data)
+            latencies['audio_decode'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            transcribe_audio(audio, ASR_PROMPTS[SCRIPT], asr_backend)
+            latencies['transcribe'].append(time.perf_counter() - start)
+
+            if not layered:
+                continue
+
+            # the first 30-second window, split into the steps model.transcribe runs for it
+            with torch.no_grad():
+                start = time.perf_counter()
+                mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=model.dims.n_mels).to(device)
+                sync()
+                latencies['mel'].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                features = model.embed_audio(mel.unsqueeze(0).to(torch.float16 if fp16 else torch.float32))
+                sync()
+                latencies['encode'].append(time.perf_counter() - start)
+
+                # audio features are passed straight to the decoder, so this times decoding alone
+                start = time.perf_counter()
+                whisper.decode(model, features, options)
+                sync()
+                latencies['decode'].append(time.perf_counter() - start)
+
+    return latencies
+
+
+def bench_asr_file(audio_dir: str, asr_backend: str | None) -> list[float]:
+    """
+    Time asr.py's per-file transcription on every file in the corpus.
+    :param audio_dir: A directory of .wav files.
+    :param asr_backend: A key of ASR_BACKENDS.
+    :return: The latency of each file.
+    """
+    from asr import transcribe
+
+    latencies = []
+    with tempfile.TemporaryDirectory() as scratch:
+        output_txt = os.path.join(scratch, 'predicted.txt')
+        for name in sorted(os.listdir(audio_dir)):
+            if name.lower().endswith('.wav'):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    transcribe(os.path.join(audio_dir, name), output_txt, True, asr_backend)
+                latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_users(
+    payloads: list,
+    users: int,
+    messages_per_user: int,
+    asr_workers: int,
+    translate_workers: int,
+    stream: bool,
+    asr_backend: str | None
+) -> dict:
+    """
+    Send messages through a fresh pipeline from several simulated users at once. Each user sends its next message once
+    the previous one has been committed.
+    :param payloads: A list of messages: float32 waveforms to transcribe or strings to translate.
+    :param users: The number of concurrent users.
+    :param messages_per_user: The number of messages each user sends.
+    :param asr_workers: The number of ASR worker threads in the pipeline.
+    :param translate_workers: The number of translation worker threads in the pipeline.
+    :param stream: If true, translations are streamed.
+    :param asr_backend: A key of ASR_BACKENDS.
+    :return: A dict containing throughput, per-stage latency percentiles, error count, and cache statistics.
+    """
+    pipeline = create_pipeline(asr_workers=asr_workers, translate_workers=translate_workers)
+    jobs = []
+    commits = []
+    lock = threading.Lock()
+    cache_before = translation_cache.stats()
+
+    def user(index: int) -> None:
+        for i in range(messages_per_user):
+            payload = payloads[(index * messages_per_user + i) % len(payloads)]
+            job = pipeline.submit(Job(
+                user='User 1' if index % 2 == 0 else 'User 2',
+                payload=payload,
+                mode='translate' if isinstance(payload, str) else 'transcribe',
+                source_language=USER_1_LANGUAGE,
+                target_language=USER_2_LANGUAGE,
+                user_1_language=USER_1_LANGUAGE,
+                user_2_language=USER_2_LANGUAGE,
+                script=SCRIPT,
+                conversation_id=f'benchmark-{users}-{index}',
+                stream=stream,
+                asr_backend=asr_backend
+            ))
+            job.done.wait()
+            done_at = job.submitted_at + job.timings['total']
+            if job.persisted is not None:
+                job.persisted.result()
+                commit = time.perf_counter() - done_at
+            else:
+                commit = None
+            with lock:
+                jobs.append(job)
+                if commit is not None:
+                    commits.append(commit)
+
+    threads = [threading.Thread(target=user, args=(i,), name=f'benchmark-user-{i}') for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stage_names = sorted({name for job in jobs for name in job.timings})
+    stages = {name: summarize([job.timings[name] for job in jobs if name in job.timings]) for name in stage_names}
+    stages['db_commit'] = summarize(commits)
+
+    cache_after = translation_cache.stats()
+
+    return {
+        'users': users,
+        'messages': len(jobs),
+        'errors': sum(job.error is not None for job in jobs),
+        'elapsed_s': elapsed,
+        'msg_per_s': len(jobs) / elapsed if elapsed > 0 else 0.0,
+        'stages': stages,
+        'cache_hits': cache_after['hits'] - cache_before['hits'],
+        'cache_misses': cache_after['misses'] - cache_before['misses']
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare results with an earlier run.
+    :param results: The results of this run.
+    :param baseline: The results of the earlier run.
+    :param tolerance: The allowed relative slowdown, e.g. 0.2 for 20%.
+    :return: A list of descriptions of every p95 latency or throughput that regressed beyond the tolerance.
+    """
+    regressions = []
+
+    def check_latency(label: str, new: dict, old: dict) -> None:
+        if new.get('n') and old.get('n') and new['p95'] > old['p95'] * (1 + tolerance):
+            regressions.append(f"{label} p95 {old['p95']:.3f}s -> {new['p95']:.3f}s")
+
+    for name, summary in results['asr_stages'].items():
+        check_latency(name, summary, baseline.get('asr_stages', {}).get(name, {}))
+
+    old_levels = {level['users']: level for level in baseline.get('concurrency', [])}
+    for level in results['concurrency']:
+        old = old_levels.get(level['users'])
+        if old is None:
+            continue
+        for name, summary in level['stages'].items():
+            check_latency(f"{level['users']} users {name}", summary, old['stages'].get(name, {}))
+        if level['msg_per_s'] < old['msg_per_s'] / (1 + tolerance):
+            regressions.append(
+                f"{level['users']} users throughput {old['msg_per_s']:.2f} -> {level['msg_per_s']:.2f} msg/s"
+            )
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='benchmark.py',
+        description='Measures end-to-end latency and throughput offline with a local corpus and a stub OpenAI server.'
+    )
+    parser.add_argument(
+        '-a', '--audio-dir',
+        type=str,
+        default=None,
+        help='A string representing the name of the directory containing the .wav files of the corpus.'
+    )
+    parser.add_argument(
+        '-t', '--texts',
+        type=str,
+        default=None,
+        help='A string representing the name of the .txt file containing one text message per line.'
+    )
+    parser.add_argument(
+        '-o', '--output',
+        type=str,
+        default='benchmark.json',
+        help='A string representing the name of the .json file to write the results to.'
+    )
+    parser.add_argument(
+        '-u', '--users',
+        type=int,
+        nargs='+',
+        default=[1, 4, 8],
+        help='The numbers of concurrent simulated users to measure.'
+    )
+    parser.add_argument(
+        '-m', '--messages',
+        type=int,
+        default=20,
+        help='An integer representing the number of messages each simulated user sends.'
+    )
+    parser.add_argument(
+        '-r', '--repeats',
+        type=int,
+        default=1,
+        help='An integer representing the number of passes over the audio files for the ASR stage timings.'
+    )
+    parser.add_argument(
+        '--asr-backend',
+        type=str,
+        default=None,
+        help='A string representing the ASR inference backend. Defaults to the ASR_BACKEND setting.'
+    )
+    parser.add_argument(
+        '--asr-workers',
+        type=int,
+        default=1,
+        help='An integer representing the number of ASR worker threads in the pipeline.'
+    )
+    parser.add_argument(
+        '--translate-workers',
+        type=int,
+        default=4,
+        help='An integer representing the number of translation worker threads in the pipeline.'
+    )
+    parser.add_argument(
+        '--stub-latency',
+        type=float,
+        default=0.2,
+        help='A float representing the stub OpenAI server\'s delay in seconds before each response.'
+    )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='A boolean determining whether translations are streamed.'
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='A boolean determining whether the translation cache is used. By default every translation is requested.'
+    )
+    parser.add_argument(
+        '--baseline',
+        type=str,
+        default=None,
+        help='A string representing the name of an earlier results .json file to check for regressions against.'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='A float representing the relative slowdown allowed before a regression is reported.'
+    )
+    args = parser.parse_args()
+
+    if not args.audio_dir and not args.texts:
+        parser.error('at least one of --audio-dir and --texts is required')
+
+    stub, stub_url = start_stub_server(args.stub_latency)
+    os.environ['OPENAI_BASE_URL'] = stub_url
+    os.environ.setdefault('OPENAI_API_KEY_TRANSLATE', 'stub')
+    os.environ['TRANSLATION_BACKEND'] = 'openai'
+
+    init_db()
+    translation_cache.enabled = args.cache
+
+    wav_files, texts = load_corpus(args.audio_dir, args.texts)
+
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'asr_backend': args.asr_backend or os.getenv('ASR_BACKEND', 'whisper'),
+            'stub_latency_s': args.stub_latency,
+            'stream': args.stream,
+            'cache': args.cache,
+            'audio_files': len(wav_files),
+            'texts': len(texts)
+        },
+        'model_load_s': None,
+        'asr_stages': {},
+        'concurrency': []
+    }
+
+    payloads = list(texts)
+    if not wav_files and not payloads:
+        parser.error('the corpus is empty')
+
+    if wav_files:
+        start = time.perf_counter()
+        asr_model(args.asr_backend)
+        results['model_load_s'] = time.perf_counter() - start
+        print(f"model load: {results['model_load_s']:.2f}s")
+
+        stage_latencies = bench_asr(wav_files, args.asr_backend, args.repeats)
+        stage_latencies['asr_file'] = bench_asr_file(args.audio_dir, args.asr_backend)
+        results['asr_stages'] = {name: summarize(values) for name, values in stage_latencies.items()}
+        for name, summary in results['asr_stages'].items():
+            print(f"{name}: p50={summary['p50']:.3f}s p95={summary['p95']:.3f}s p99={summary['p99']:.3f}s")
+
+        payloads.extend(wav_bytes_to_float32(data) for data in wav_files)
+
+    for users in args.users:
+        level = bench_users(
+            payloads, users, args.messages, args.asr_workers, args.translate_workers, args.stream, args.asr_backend
+        )
+        results['concurrency'].append(level)
+        total = level['stages']['total']
+        print(f"{users} users: {level['msg_per_s']:.2f} msg/s, total p50={total['p50']:.3f}s "
+              f"p95={total['p95']:.3f}s p99={total['p99']:.3f}s, errors={level['errors']}")
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    print(f"peak RSS: {results['peak_rss_mb']:.0f} MB")
+
+    stub.shutdown()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
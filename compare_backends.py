@@ -0,0 +1,101 @@
+import argparse
+import statistics
+import time
+
+from translation_backend import BACKENDS, get_backend
+
+SYSTEM_PROMPT = 'You are a bilingual Cantonese-English conversation translator.'
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """
+    Compute a percentile by nearest rank.
+    :param values: A list of measurements.
+    :param pct: The percentile to compute, between 0 and 100.
+    :return: The measurement at that percentile.
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def benchmark(backend_name: str, texts: list[str], source_language: str, target_language: str,
+              batch_size: int) -> dict:
+    """
+    Measure per-message latency and batched throughput of a translation backend.
+    :param backend_name: A key of BACKENDS.
+    :param texts: A list of messages to translate.
+    :param source_language: A string corresponding to the source language.
+    :param target_language: A string corresponding to the target language.
+    :param batch_size: The number of messages per translate_batch call.
+    :return: A dict containing load time, latency percentiles, and messages per second.
+    """
+    start = time.perf_counter()
+    backend = get_backend(backend_name)
+    load_seconds = time.perf_counter() - start
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        backend.translate(text, source_language, target_language, SYSTEM_PROMPT)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        backend.translate_batch(texts[i:i + batch_size], source_language, target_language, SYSTEM_PROMPT)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'backend': backend.name,
+        'load_s': load_seconds,
+        'mean_s': statistics.mean(latencies),
+        'p50_s': percentile(latencies, 50),
+        'p95_s': percentile(latencies, 95),
+        'sequential_msg_per_s': len(texts) / sum(latencies),
+        'batched_msg_per_s': len(texts) / batch_seconds if batch_seconds > 0 else 0.0
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='compare_backends.py',
+        description='Compares the latency and throughput of the translation backends.'
+    )
+    parser.add_argument(
+        'input_txt',
+        type=str,
+        help='A string representing the name of the .txt file containing one message per line.'
+    )
+    parser.add_argument(
+        '-s', '--source',
+        type=str,
+        default='Cantonese',
+        help='A string representing the source language label, e.g. Cantonese or English.'
+    )
+    parser.add_argument(
+        '-t', '--target',
+        type=str,
+        default='English',
+        help='A string representing the target language label, e.g. Cantonese or English.'
+    )
+    parser.add_argument(
+        '-b', '--backends',
+        nargs='+',
+        default=list(BACKENDS),
+        choices=list(BACKENDS),
+        help='The backends to compare.'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=16,
+        help='An integer representing the number of messages per batched call.'
+    )
+    args = parser.parse_args()
+
+    with open(args.input_txt, 'r', encoding='utf-8') as f:
+        messages = [line.strip() for line in f if line.strip()]
+
+    for name in args.backends:
+        result = benchmark(name, messages, args.source, args.target, args.batch_size)
+        print(' '.join(f'{key}={value:.3f}' if isinstance(value, float) else f'{key}={value}'
+                       for key, value in result.items()))
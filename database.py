@@ -0,0 +1,209 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from sqlalchemy import create_engine, event, inspect, text, Column, Float, Index, Integer, String, Text
+from sqlalchemy.orm import Session as SessionType, defer, sessionmaker, declarative_base
+
+import tracing
+from audio_store import audio_store
+from pipeline import DEFAULT_CONVERSATION
+
+Base = declarative_base()
+
+
+class Message(Base):
+    __tablename__ = 'messages'
+    # an INTEGER PRIMARY KEY is SQLite's rowid, so keyset pagination on id walks the table's own B-tree
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(String, nullable=False, default=DEFAULT_CONVERSATION)
+    created_at = Column(Float, default=time.time)
+    user = Column(String)
+    raw_text = Column(String)
+    translated_text = Column(String)
+    source_language = Column(String)
+    target_language = Column(String)
+    # JSON-encoded tracing spans (see tracing.Trace) recorded while the message was processed
+    trace = Column(Text)
+
+    # serves both per-conversation pagination and per-conversation deletes. AUTOINCREMENT keeps SQLite from reusing
+    # the IDs of deleted messages, which key archived audio
+    __table_args__ = (Index('ix_messages_conversation_id_id', 'conversation_id', 'id'), {'sqlite_autoincrement': True})
+
+
+db = os.getenv('DATABASE_URL', "sqlite:///./database.db")
+
+if db.startswith('sqlite'):
+    engine = create_engine(
+        db,
+        pool_size=10,
+        max_overflow=20,
+        connect_args={'check_same_thread': False, 'timeout': 30}
+    )
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        """
+        Tune every new SQLite connection: WAL lets readers proceed while a write is in progress.
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA busy_timeout=5000')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.execute('PRAGMA cache_size=-20000')
+        cursor.execute('PRAGMA mmap_size=268435456')
+        cursor.close()
+
+else:
+    engine = create_engine(db, pool_size=10, max_overflow=20)
+
+Session = sessionmaker(bind=engine)
+
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def init_db() -> None:
+    """
+    Create missing tables, add columns introduced since the database was created, and create missing indexes.
+    Runs once per process.
+    """
+    global _initialized
+
+    with _init_lock:
+        if _initialized:
+            return
+
+        # registers the translation cache's table, whose module imports this one
+        import translation_cache
+
+        Base.metadata.create_all(bind=engine)
+
+        columns = {column['name'] for column in inspect(engine).get_columns('messages')}
+        with engine.begin() as connection:
+            if 'conversation_id' not in columns:
+                connection.execute(text(
+                    f"ALTER TABLE messages ADD COLUMN conversation_id VARCHAR NOT NULL DEFAULT '{DEFAULT_CONVERSATION}'"
+                ))
+            if 'created_at' not in columns:
+                connection.execute(text('ALTER TABLE messages ADD COLUMN created_at FLOAT'))
+            if 'trace' not in columns:
+                connection.execute(text('ALTER TABLE messages ADD COLUMN trace TEXT'))
+
+        for index in Message.__table__.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+        _initialized = True
+
+
+def load_messages(
+    session: SessionType,
+    conversation_id: str = DEFAULT_CONVERSATION,
+    before_id: int | None = None,
+    limit: int = 50
+) -> list[Message]:
+    """
+    Load a page of conversation history using keyset pagination on the message ID.
+    :param session: An open database session.
+    :param conversation_id: A string identifying the conversation.
+    :param before_id: If given, only messages older than this ID are returned.
+    :param limit: The maximum number of messages to return.
+    :return: A list of up to `limit` messages, oldest first, immediately preceding `before_id`. Traces are not loaded.
+    """
+    query = session.query(Message).options(defer(Message.trace)).filter(Message.conversation_id == conversation_id)
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    rows = query.order_by(Message.id.desc()).limit(limit).all()
+    return rows[::-1]
+
+
+class MessageWriter:
+    """
+    Write-behind queue for new messages.
+
+    Messages are inserted by a background thread that gathers whatever has been submitted within `flush_interval`
+    seconds (up to `batch_size` messages) and writes it in a single transaction, so concurrent conversations share
+    commits instead of contending for the database lock one message at a time.
+    """
+
+    def __init__(self, batch_size: int = 64, flush_interval: float = 0.05):
+        """
+        :param batch_size: The maximum number of messages written per commit.
+        :param flush_interval: How long in seconds to wait for more messages before committing a batch.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, message: Message) -> Future:
+        """
+        Queue a message for insertion.
+        :param message: A new, unsaved Message.
+        :return: A future resolving to the message's ID once it has been committed.
+        """
+        future = Future()
+        self._queue.put((message, future))
+        return future
+
+    def _run(self) -> None:
+        """
+        Worker loop that commits queued messages in batches.
+        """
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                with Session() as session, tracing.span('db_commit', messages=len(batch)):
+                    session.add_all([message for message, _ in batch])
+                    session.flush()
+                    ids = [message.id for message, _ in batch]
+                    session.commit()
+                for (_, future), message_id in zip(batch, ids):
+                    future.set_result(message_id)
+            except Exception as error:
+                for _, future in batch:
+                    future.set_exception(error)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self) -> None:
+        """
+        Block until every submitted message has been committed.
+        """
+        self._queue.join()
+
+
+writer = MessageWriter()
+atexit.register(writer.flush)
+
+
+def delete_conversation(conversation_id: str) -> None:
+    """
+    Delete every message in a conversation, including messages still waiting in the write-behind queue, and their
+    archived audio.
+    :param conversation_id: A string identifying the conversation.
+    """
+    writer.flush()
+    with Session() as session:
+        query = session.query(Message).filter(Message.conversation_id == conversation_id)
+        message_ids = [row.id for row in query.with_entities(Message.id)]
+        query.delete()
+        session.commit()
+    if audio_store is not None:
+        audio_store.delete(conversation_id, message_ids)
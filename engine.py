@@ -0,0 +1,480 @@
+import contextvars
+import os
+import threading
+import weakref
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Iterator
+
+import numpy as np
+from sqlalchemy import update
+
+import tracing
+from asr_backends import FasterWhisperModel, decode_profile, transcribe_options
+from asr_prompt import Prompt, PromptBuilder
+from audio_store import audio_store
+from audio_utils import SAMPLE_RATE
+from database import Message, Session, writer
+from pipeline import Job, Pipeline, message_languages
+from translation_backend import get_backend
+from translation_cache import translation_cache
+from vad import trim_silence
+
+# Whisper's initial prompt for each Chinese script, which nudges it towards code-switched written Cantonese
+ASR_PROMPTS = {
+    'Simplified 简体字': '我啱啱食完lunch，好饱啊。你今晚有冇兴趣去party？We can go together.',
+    'Traditional 繁體字': '我啱啱食完lunch，好飽啊。你今晚有冇興趣去party？We can go together.'
+}
+
+# the number of stored messages a conversation's prompt builder starts from, and of conversations kept in memory
+PROMPT_HISTORY = int(os.getenv('ASR_PROMPT_HISTORY', '50'))
+MAX_PROMPT_BUILDERS = 256
+
+# held weakly, so a model's lock goes away with the model once the registry has evicted it and no caller holds it
+_asr_locks = weakref.WeakKeyDictionary()
+_asr_locks_lock = threading.Lock()
+
+_prompt_builders = OrderedDict()
+_prompt_builders_lock = threading.Lock()
+
+
+def asr_model(backend: str | None = None, profile: str | None = None):
+    """
+    Fetch the resident Whisper model, importing torch and Whisper only the first time speech is actually used so that
+    text-only callers never pay for them.
+    :param backend: A key of ASR_BACKENDS selecting the inference backend. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES, which selects the model size. Defaults to the ASR_PROFILE setting.
+    :return: The loaded model.
+    """
+    import torch
+    from model_registry import get_model
+
+    # keeps Streamlit's file watcher from crashing while walking torch.classes
+    torch.classes.__path__ = []
+    return get_model(decode_profile(profile)['model_size'], backend=backend)
+
+
+def model_lock(model):
+    """
+    Fetch the lock that serializes calls to a shared Whisper model. openai-whisper installs its decoding hooks on the
+    model itself, so only faster-whisper runs calls concurrently.
+    :param model: A loaded Whisper model.
+    :return: A context manager held for the duration of each `transcribe` call.
+    """
+    if isinstance(model, FasterWhisperModel):
+        return nullcontext()
+    with _asr_locks_lock:
+        return _asr_locks.setdefault(model, threading.Lock())
+
+
+def prompt_builder(conversation_id: str) -> PromptBuilder:
+    """
+    Fetch the ASR prompt builder of a conversation, seeding a new one from the conversation's recent stored messages.
+    :param conversation_id: A string identifying the conversation.
+    :return: The conversation's prompt builder.
+    """
+    with _prompt_builders_lock:
+        builder = _prompt_builders.get(conversation_id)
+        if builder is not None:
+            _prompt_builders.move_to_end(conversation_id)
+            return builder
+
+        builder = PromptBuilder()
+        with Session() as session:
+            rows = (
+                session.query(Message.raw_text)
+                .filter(Message.conversation_id == conversation_id)
+                .order_by(Message.id.desc())
+                .limit(PROMPT_HISTORY)
+                .all()
+            )
+        for row in reversed(rows):
+            builder.observe(row.raw_text or '')
+
+        _prompt_builders[conversation_id] = builder
+        if len(_prompt_builders) > MAX_PROMPT_BUILDERS:
+            _prompt_builders.popitem(last=False)
+        return builder
+
+
+def forget_prompt(conversation_id: str) -> None:
+    """
+    Drop a conversation's prompt builder, e.g. after the conversation has been cleared.
+    :param conversation_id: A string identifying the conversation.
+    """
+    with _prompt_builders_lock:
+        _prompt_builders.pop(conversation_id, None)
+
+
+def asr_prompt(conversation_id: str, script: str) -> Prompt:
+    """
+    Build Whisper's initial prompt for the next message of a conversation: the script's sample sentence, preceded by
+    the conversation's recent code-switched terms.
+    :param conversation_id: A string identifying the conversation.
+    :param script: A string corresponding to the selected Chinese script.
+    :return: The prompt, cached until the conversation brings in a new term.
+    """
+    return prompt_builder(conversation_id).prompt(ASR_PROMPTS[script])
+
+
+def transcribe_audio(
+    audio: np.ndarray,
+    prompt: str | Prompt,
+    backend: str | None = None,
+    profile: str | None = None
+) -> str:
+    """
+    Transcribe the provided audio using Whisper.
+    :param audio: A float32 waveform sampled at 16 kHz.
+    :param prompt: Whisper's initial prompt. faster-whisper is given a Prompt's cached token IDs; openai-whisper only
+        accepts prompt text.
+    :param backend: A key of ASR_BACKENDS selecting the inference backend. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the model size and decoding options. Defaults to the
+        ASR_PROFILE setting.
+    :return: The raw text output from Whisper.
+    """
+    model = asr_model(backend, profile)
+    audio = trim_silence(audio)
+
+    if isinstance(prompt, Prompt):
+        prompt = list(prompt.tokens) if isinstance(model, FasterWhisperModel) else prompt.text
+
+    with model_lock(model), tracing.span('model_transcribe', audio_seconds=round(len(audio) / SAMPLE_RATE, 2)):
+        transcription = model.transcribe(
+            audio=audio,
+            language='zh',
+            task='transcribe',
+            initial_prompt=prompt,
+            **transcribe_options(decode_profile(profile), model)
+        )
+
+    return transcription['text']
+
+
+def system_prompt(user_1_language: str, user_2_language: str) -> str:
+    """
+    Build the conversation-level translation instructions.
+    :param user_1_language: A string corresponding to User 1's preferred language.
+    :param user_2_language: A string corresponding to User 2's preferred language.
+    :return: The system prompt for the translation backend.
+    """
+    return (
+        f"You are a bilingual conversation translator. User 1 prefers {user_1_language}, and User 2 prefers "
+        f"{user_2_language}. When a user sends a message in either Cantonese, English, or a mix of both, "
+        f"translate it fully into the language the other user prefers. Maintain meaning, structure, and "
+        f"punctuation as closely as possible. Do not use em dashes or semicolons if the original text only "
+        f"uses commas. Do not assume the message is always in one language, detect it dynamically.\n\n "
+        f"**IMPORTANT: If translating into Cantonese, you must use written Cantonese with colloquial "
+        f"vocabulary.** It is extremely important that you do not use Mandarin or Standard Chinese. Use "
+        f"words and sentence structures common in Hong Kong written Cantonese. For example:\n "
+        f"- Use '咗' for past tense instead of other forms.\n "
+        f"- Use '佢哋' for 'they' instead of '他们'.\n "
+        f"- Use '冇' for negation instead of '没有'.\n "
+        f"- Use '喺' for prepositions like 'at'/'in'/'on' instead of '在'.\n"
+        f"Remember, you must ensure that text containing exclusively English or a mix of both English and "
+        f"Cantonese must be translated fully into Cantonese using written Cantonese, not Mandarin or "
+        f"Standard Chinese. Use colloquial vocabulary and sentence structures common in Hong Kong written "
+        f"Cantonese. If the original text already contains Chinese characters, please try to only change "
+        f"the English text and maintain the original Cantonese text in terms of wording and structure, even "
+        f"if it is not colloquial Cantonese but rather is Standard Chinese. "
+        f"**However, there must be no English text left in the output!**"
+    )
+
+
+def translate_text(
+    raw_text: str,
+    source_language: str,
+    target_language: str,
+    user_1_language: str,
+    user_2_language: str,
+    script: str,
+    on_update: Callable[[str, str], None] | None = None,
+    backend: str | None = None
+) -> str:
+    """
+    Translate text from the source language to the target language using GPT-4o-mini or another translation backend.
+    :param raw_text: The text to be translated.
+    :param source_language: A string corresponding to the source language from which the text is to be translated.
+    :param target_language: A string corresponding to the target language into which the text is to be translated.
+    :param user_1_language: A string corresponding to User 1's preferred language.
+    :param user_2_language: A string corresponding to User 2's preferred language.
+    :param script: A string corresponding to the selected Chinese script.
+    :param on_update: If given, the translation is streamed and this is called with the raw text and the translation
+    so far every time new tokens arrive.
+    :param backend: A key of BACKENDS selecting the translation backend. Defaults to the TRANSLATION_BACKEND setting.
+    :return: The translated text output from the backend.
+    """
+    prompt = system_prompt(user_1_language, user_2_language)
+    translator = get_backend(backend)
+
+    tracing.annotate(translation_backend=translator.name)
+
+    with tracing.span('cache_lookup') as span:
+        cached = translation_cache.get(raw_text, source_language, target_language, script, prompt, translator.name)
+        span['hit'] = cached is not None
+    tracing.count('translation_cache_hits' if cached is not None else 'translation_cache_misses')
+
+    if cached is not None:
+        if on_update is not None:
+            on_update(raw_text, cached)
+        return cached
+
+    if on_update is None:
+        translated_text = translator.translate(raw_text, source_language, target_language, prompt)
+
+    else:
+        translated_text = ''
+        for delta in translator.translate_stream(raw_text, source_language, target_language, prompt):
+            translated_text += delta
+            on_update(raw_text, translated_text)
+
+        translated_text = translated_text.strip()
+
+    translation_cache.put(raw_text, source_language, target_language, script, prompt, translator.name, translated_text)
+
+    return translated_text
+
+
+def translate_texts(
+    raw_texts: list[str],
+    source_language: str,
+    target_language: str,
+    user_1_language: str,
+    user_2_language: str,
+    script: str,
+    backend: str | None = None
+) -> list[str]:
+    """
+    Translate many messages that share a language pair, sending only the cache misses to the backend in batches.
+    :param raw_texts: The texts to be translated.
+    :param source_language: A string corresponding to the source language from which the texts are to be translated.
+    :param target_language: A string corresponding to the target language into which the texts are to be translated.
+    :param user_1_language: A string corresponding to User 1's preferred language.
+    :param user_2_language: A string corresponding to User 2's preferred language.
+    :param script: A string corresponding to the selected Chinese script.
+    :param backend: A key of BACKENDS selecting the translation backend. Defaults to the TRANSLATION_BACKEND setting.
+    :return: A list of translated texts in the same order as `raw_texts`.
+    """
+    prompt = system_prompt(user_1_language, user_2_language)
+    translator = get_backend(backend)
+
+    translations = translation_cache.get_many(
+        raw_texts, source_language, target_language, script, prompt, translator.name
+    )
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    tracing.count('translation_cache_hits', len(raw_texts) - len(missing))
+    tracing.count('translation_cache_misses', len(missing))
+
+    if missing:
+        with tracing.span('translate_batch', messages=len(missing), backend=translator.name):
+            translated = translator.translate_batch(
+                [raw_texts[i] for i in missing], source_language, target_language, prompt
+            )
+        for i, translated_text in zip(missing, translated):
+            translations[i] = translated_text
+            translation_cache.put(
+                raw_texts[i], source_language, target_language, script, prompt, translator.name, translated_text
+            )
+
+    return translations
+
+
+def retranslate_conversation(
+    conversation_id: str,
+    user_1_language: str,
+    user_2_language: str,
+    script: str,
+    backend: str | None = None
+) -> int:
+    """
+    Translate every stored message of a conversation again, e.g. after the users' languages have changed, and update
+    the stored translations in one transaction.
+    :param conversation_id: A string identifying the conversation.
+    :param user_1_language: A string corresponding to User 1's preferred language.
+    :param user_2_language: A string corresponding to User 2's preferred language.
+    :param script: A string corresponding to the selected Chinese script.
+    :param backend: A key of BACKENDS selecting the translation backend. Defaults to the TRANSLATION_BACKEND setting.
+    :return: The number of messages re-translated.
+    """
+    writer.flush()
+    with Session() as session:
+        rows = (
+            session.query(Message.id, Message.user, Message.raw_text)
+            .filter(Message.conversation_id == conversation_id)
+            .order_by(Message.id)
+            .all()
+        )
+
+    # one batch per direction, since a packed request shares a single language pair
+    groups = defaultdict(list)
+    for row in rows:
+        groups[message_languages(row.user, user_1_language, user_2_language)].append(row)
+
+    # both directions are translated at once; the backend caps the requests in flight
+    with ThreadPoolExecutor(max_workers=max(len(groups), 1)) as executor:
+        futures = {
+            languages: executor.submit(
+                contextvars.copy_context().run, translate_texts, [row.raw_text for row in group], *languages,
+                user_1_language, user_2_language, script, backend
+            )
+            for languages, group in groups.items()
+        }
+
+    updates = []
+    for (source_language, target_language), group in groups.items():
+        translations = futures[(source_language, target_language)].result()
+        updates.extend(
+            {
+                'id': row.id,
+                'translated_text': translated_text,
+                'source_language': source_language,
+                'target_language': target_language
+            }
+            for row, translated_text in zip(group, translations)
+        )
+
+    if updates:
+        with Session() as session:
+            session.execute(update(Message), updates)
+            session.commit()
+
+    return len(updates)
+
+
+def retranscribe_messages(
+    script: str,
+    conversation_id: str | None = None,
+    backend: str | None = None,
+    profile: str | None = None,
+    write: bool = True,
+    batch_size: int = 100
+) -> Iterator[dict]:
+    """
+    Transcribe stored messages again from their archived audio, e.g. with another ASR backend or prompt. Audio is
+    read from the audio store one message at a time, so memory use does not grow with the size of the history.
+    :param script: A string corresponding to the selected Chinese script, which selects Whisper's prompt.
+    :param conversation_id: If given, only messages of this conversation are transcribed.
+    :param backend: A key of ASR_BACKENDS selecting the inference backend. Defaults to the ASR_BACKEND setting.
+    :param profile: A key of DECODE_PROFILES selecting the decoding options. Defaults to the ASR_PROFILE setting.
+    :param write: If true, the stored transcriptions are replaced, `batch_size` messages per transaction.
+    :param batch_size: The number of messages updated per transaction.
+    :return: An iterator of dicts containing the message ID, user, previous transcription and new transcription, one
+        per message with archived audio, oldest first.
+    """
+    if audio_store is None:
+        raise RuntimeError('Set AUDIO_STORE_DIR to archive audio before re-transcribing messages')
+
+    writer.flush()
+    with Session() as session:
+        query = session.query(Message.id, Message.conversation_id, Message.user, Message.raw_text)
+        if conversation_id is not None:
+            query = query.filter(Message.conversation_id == conversation_id)
+        # a clip only counts for the conversation it was recorded in, even if its message ID has been reused
+        rows = [row for row in query.order_by(Message.id).all() if (row.id, row.conversation_id) in audio_store]
+
+    # each conversation is replayed with the prompts it would get live, built from the new transcriptions
+    builders = defaultdict(PromptBuilder)
+    updates = []
+    for row in rows:
+        builder = builders[row.conversation_id]
+        audio = audio_store.get(row.id, row.conversation_id)
+        raw_text = transcribe_audio(audio, builder.prompt(ASR_PROMPTS[script]), backend, profile)
+        builder.observe(raw_text)
+        if write:
+            updates.append({'id': row.id, 'raw_text': raw_text})
+        if len(updates) >= batch_size:
+            with Session() as session:
+                session.execute(update(Message), updates)
+                session.commit()
+            updates = []
+        yield {'id': row.id, 'user': row.user, 'previous': row.raw_text, 'raw_text': raw_text}
+
+    if updates:
+        with Session() as session:
+            session.execute(update(Message), updates)
+            session.commit()
+
+
+def asr_stage(job: Job) -> None:
+    """
+    Pipeline stage that transcribes recorded or uploaded audio. Text messages pass straight through.
+    :param job: The message being processed.
+    """
+    if job.mode == 'transcribe':
+        prompt = asr_prompt(job.conversation_id, job.script)
+        job.raw_text = transcribe_audio(job.payload, prompt, job.asr_backend, job.asr_profile)
+    else:
+        job.raw_text = job.payload
+
+    # later messages of the conversation are prompted with this message's terms
+    prompt_builder(job.conversation_id).observe(job.raw_text)
+
+
+def translation_stage(job: Job) -> None:
+    """
+    Pipeline stage that translates the message, exposing partial output on the job while it streams.
+    :param job: The message being processed.
+    """
+    def update(raw_text: str, translated_text: str) -> None:
+        job.translated_text = translated_text
+
+    job.translated_text = translate_text(
+        job.raw_text, job.source_language, job.target_language, job.user_1_language, job.user_2_language, job.script,
+        on_update=update if job.stream else None,
+        backend=job.backend
+    )
+
+
+def persistence_stage(job: Job) -> None:
+    """
+    Pipeline stage that hands the finished message to the write-behind queue, which commits messages in batches.
+    Messages with speech wait for their ID on this thread so the audio can be archived under it without holding up
+    the writer's commits.
+    :param job: The message being processed.
+    """
+    job.persisted = writer.submit(Message(
+        conversation_id=job.conversation_id,
+        user=job.user,
+        raw_text=job.raw_text,
+        translated_text=job.translated_text,
+        source_language=job.source_language,
+        target_language=job.target_language,
+        trace=job.trace.to_json()
+    ))
+
+    def record_id(committed: Future) -> None:
+        if committed.exception() is None:
+            job.message_id = committed.result()
+
+    job.persisted.add_done_callback(record_id)
+
+    audio = job.audio if job.audio is not None else job.payload
+    if audio_store is not None and isinstance(audio, np.ndarray):
+        audio_store.put(job.persisted.result(), job.conversation_id, audio)
+
+
+STAGES = [('asr', asr_stage), ('translate', translation_stage), ('persist', persistence_stage)]
+
+
+def process(job: Job) -> Job:
+    """
+    Run every stage on a job in the calling thread, for callers that do not need the background pipeline.
+    :param job: The message to process.
+    :return: The same job, with its text fields filled in. Errors are raised rather than recorded on the job.
+    """
+    for _, stage in STAGES:
+        stage(job)
+    job.done.set()
+    return job
+
+
+def create_pipeline(asr_workers: int = 1, translate_workers: int = 1, maxsize: int = 8) -> Pipeline:
+    """
+    Create a message pipeline with ASR, translation and persistence stages.
+    :param asr_workers: The number of ASR worker threads. They share the resident models.
+    :param translate_workers: The number of translation worker threads.
+    :param maxsize: The capacity of the queue in front of each stage.
+    :return: The running pipeline.
+    """
+    return Pipeline(STAGES, maxsize=maxsize, workers={'asr': asr_workers, 'translate': translate_workers})
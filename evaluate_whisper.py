@@ -1,7 +1,23 @@
 import argparse
+import csv
+import json
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from typing import Iterable, Iterator
+
 from Levenshtein import distance as levenshtein_distance
-from jiwer import wer
+
+CANTONESE_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+ENGLISH_PATTERN = re.compile(r'[a-zA-Z0-9]+')
+
+# per-sample fields written to the structured results file
+RESULT_FIELDS = [
+    'Gold', 'Predicted', 'Gold Cantonese', 'Pred Cantonese', 'Gold English', 'Pred English', 'Cantonese CER',
+    'English WER', 'Cantonese Errors', 'Cantonese Chars', 'English Errors', 'English Words'
+]
 
 
 def split_lang(text: str) -> tuple[str, str]:
@@ -10,8 +26,8 @@ def split_lang(text: str) -> tuple[str, str]:
     :param text: A string containing Cantonese-English code-switched text.
     :return: A tuple containing the Cantonese text and the English text.
     """
-    cantonese = ''.join(char for char in text if '\u4e00' <= char <= '\u9fff')
-    english = ' '.join(re.findall(r'[a-zA-Z0-9]+', text))
+    cantonese = ''.join(CANTONESE_PATTERN.findall(text))
+    english = ' '.join(ENGLISH_PATTERN.findall(text))
     return cantonese, english
 
 
@@ -27,30 +43,29 @@ def compute_cantonese_cer(gold: str, predicted: str) -> float:
     return levenshtein_distance(gold, predicted) / len(gold) if len(gold) > 0 else 0.0
 
 
-def compute_english_wer(gold: str, predicted: str) -> float:
-    """
-    Given English gold and predicted strings, compute the word error rate.
-    :param gold: The English gold string.
-    :param predicted: The English predicted string.
-    :return: The word error rate between the English gold and predicted strings.
-    """
-    gold = gold.lower()
-    predicted = predicted.lower()
-    return wer(gold, predicted)
-
-
 def evaluate_sample(gold: str, predicted: str) -> dict:
     """
     Evaluate a predicted string against its gold counterpart.
     :param gold: The Cantonese-English code-switched gold string.
     :param predicted: The Cantonese-English code-switched predicted string.
-    :return: A dict containing gold and pred raw text, Cantonese and English split text, Cantonese CER, and English WER.
+    :return: A dict containing gold and pred raw text, Cantonese and English split text, Cantonese CER, English WER,
+    and the error and reference counts behind them.
     """
     gold_can, gold_en = split_lang(gold)
     predicted_can, predicted_en = split_lang(predicted)
 
+    cantonese_errors = levenshtein_distance(gold_can, predicted_can)
     cantonese_cer = compute_cantonese_cer(gold_can, predicted_can)
-    english_wer = compute_english_wer(gold_en, predicted_en)
+
+    # word error rate as the word-level edit distance on the already tokenized English
+    gold_words = gold_en.lower().split()
+    predicted_words = predicted_en.lower().split()
+    english_errors = levenshtein_distance(gold_words, predicted_words)
+    # an all-Cantonese gold line is scored like an empty Cantonese one
+    if gold_words:
+        english_wer = english_errors / len(gold_words)
+    else:
+        english_wer = 1.0 if predicted_words else 0.0
 
     return {
         "Gold": gold,
@@ -60,36 +75,125 @@ def evaluate_sample(gold: str, predicted: str) -> dict:
         "Gold English": gold_en,
         "Pred English": predicted_en,
         "Cantonese CER": cantonese_cer,
-        "English WER": english_wer
+        "English WER": english_wer,
+        "Cantonese Errors": cantonese_errors,
+        "Cantonese Chars": len(gold_can),
+        "English Errors": english_errors,
+        "English Words": len(gold_words)
     }
 
 
-def get_results(gold_text: list[str], predicted_text: list[str], output_txt: str) -> None:
+def evaluate_chunk(pairs: list[tuple[str, str]]) -> list[dict]:
+    """
+    Evaluate a chunk of samples. Runs in a worker process in bulk mode.
+    :param pairs: A list of (gold, predicted) string pairs.
+    :return: A list of evaluation results in the same order.
+    """
+    return [evaluate_sample(gold, predicted) for gold, predicted in pairs]
+
+
+def evaluate_pairs(pairs: Iterable[tuple[str, str]], workers: int = 1, chunk_size: int = 1000) -> Iterator[dict]:
+    """
+    Evaluate samples in chunks, optionally across worker processes, keeping only a few chunks in memory at a time.
+    :param pairs: An iterable of (gold, predicted) string pairs.
+    :param workers: The number of worker processes. With 1, samples are evaluated in this process.
+    :param chunk_size: The number of samples sent to a worker at once.
+    :return: An iterator over evaluation results in input order.
+    """
+    pairs = iter(pairs)
+    chunks = iter(lambda: list(islice(pairs, chunk_size)), [])
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from evaluate_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(evaluate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def get_results(
+    gold_text: Iterable[str],
+    predicted_text: Iterable[str],
+    output_txt: str,
+    results_path: str | None = None,
+    workers: int = 1,
+    chunk_size: int = 1000
+) -> dict:
     """
     Retrieve the evaluation results for a batch of Cantonese-English code-switched text.
-    :param gold_text: A list of Cantonese-English code-switched gold text.
-    :param predicted_text: A list Cantonese-English code-switched predicted text.
+    :param gold_text: An iterable of Cantonese-English code-switched gold text.
+    :param predicted_text: An iterable of Cantonese-English code-switched predicted text.
     :param output_txt: A .txt file containing batched evaluation results.
+    :param results_path: An optional .jsonl or .csv file to write the per-sample results to.
+    :param workers: The number of worker processes.
+    :param chunk_size: The number of samples sent to a worker at once.
+    :return: A dict containing the number of samples and the macro- and micro-averaged CER and WER.
     """
-    results = [evaluate_sample(gold, pred) for gold, pred in zip(gold_text, predicted_text)]
+    samples = 0
+    cer_sum = wer_sum = 0.0
+    cantonese_errors = cantonese_chars = english_errors = english_words = 0
+
+    results = evaluate_pairs(zip(gold_text, predicted_text), workers, chunk_size)
+
+    with ExitStack() as stack:
+        out = stack.enter_context(open(output_txt, 'w', encoding='utf-8'))
+        structured = None
+        writer = None
+        if results_path:
+            structured = stack.enter_context(open(results_path, 'w', encoding='utf-8', newline=''))
+            if results_path.endswith('.csv'):
+                writer = csv.DictWriter(structured, fieldnames=RESULT_FIELDS)
+                writer.writeheader()
 
-    with open(output_txt, 'w', encoding='utf-8') as out:
         for i, result in enumerate(results, 1):
-            print(f"Sample {i}", file=out)
-            print(f"Gold: {result['Gold']}", file=out)
-            print(f"Predicted: {result['Predicted']}", file=out)
-            print(f"Cantonese CER: {result['Cantonese CER']:.3f}", file=out)
-            print(f"English WER: {result['English WER']:.3f}", file=out)
-            print('-' * 60, file=out)
-
-        cantonese_cer = [result['Cantonese CER'] for result in results]
-        english_wer = [result['English WER'] for result in results]
-
-        avg_cer = sum(cantonese_cer) / len(cantonese_cer) if len(cantonese_cer) > 0 else 0.0
-        avg_wer = sum(english_wer) / len(english_wer) if len(english_wer) > 0 else 0.0
-
-        print(f"Average Cantonese CER: {avg_cer:.3f}", file=out)
-        print(f"Average English WER: {avg_wer:.3f}", file=out)
+            out.write(
+                f"Sample {i}\n"
+                f"Gold: {result['Gold']}\n"
+                f"Predicted: {result['Predicted']}\n"
+                f"Cantonese CER: {result['Cantonese CER']:.3f}\n"
+                f"English WER: {result['English WER']:.3f}\n"
+                f"{'-' * 60}\n"
+            )
+
+            if writer is not None:
+                writer.writerow(result)
+            elif structured is not None:
+                structured.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+            samples += 1
+            cer_sum += result['Cantonese CER']
+            wer_sum += result['English WER']
+            cantonese_errors += result['Cantonese Errors']
+            cantonese_chars += result['Cantonese Chars']
+            english_errors += result['English Errors']
+            english_words += result['English Words']
+
+        summary = {
+            'samples': samples,
+            'avg_cer': cer_sum / samples if samples > 0 else 0.0,
+            'avg_wer': wer_sum / samples if samples > 0 else 0.0,
+            # corpus-level: total edits over total reference characters/words, so long samples weigh more. English
+            # predicted for all-Cantonese gold lines adds errors but no reference words, so micro_wer can exceed 1.0
+            'micro_cer': cantonese_errors / cantonese_chars if cantonese_chars > 0 else 0.0,
+            'micro_wer': english_errors / english_words if english_words > 0 else 0.0
+        }
+
+        out.write(
+            f"Average Cantonese CER: {summary['avg_cer']:.3f}\n"
+            f"Average English WER: {summary['avg_wer']:.3f}\n"
+            f"Corpus Cantonese CER: {summary['micro_cer']:.3f}\n"
+            f"Corpus English WER: {summary['micro_wer']:.3f} (can exceed 1.0: English predicted for gold lines without "
+            f"English counts as errors)\n"
+        )
+
+    return summary
 
 
 if __name__ == '__main__':
@@ -112,17 +216,37 @@ if __name__ == '__main__':
         type=str,
         help='A string representing the name of the .txt file to write the evaluation results.'
     )
+    parser.add_argument(
+        '-r', '--results',
+        type=str,
+        default=None,
+        help='A string representing the name of a .jsonl or .csv file to write per-sample results to.'
+    )
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=1,
+        help='An integer representing the number of worker processes used to compute CER/WER.'
+    )
+    parser.add_argument(
+        '-c', '--chunk-size',
+        type=int,
+        default=1000,
+        help='An integer representing the number of samples sent to a worker process at once.'
+    )
     args = parser.parse_args()
 
-    gold_transcriptions = []
-    predicted_transcriptions = []
-
-    with open(args.gold_txt, 'r', encoding='utf-8') as f:
-        for line in f:
-            gold_transcriptions.append(line.strip())
-
-    with open(args.predicted_txt, 'r', encoding='utf-8') as f:
-        for line in f:
-            predicted_transcriptions.append(line.strip())
-
-    get_results(gold_transcriptions, predicted_transcriptions, args.output_txt)
+    # both files are streamed line by line rather than read into memory
+    with open(args.gold_txt, 'r', encoding='utf-8') as gold_file, \
+            open(args.predicted_txt, 'r', encoding='utf-8') as predicted_file:
+        summary = get_results(
+            (line.strip() for line in gold_file),
+            (line.strip() for line in predicted_file),
+            args.output_txt,
+            results_path=args.results,
+            workers=args.workers,
+            chunk_size=args.chunk_size
+        )
+
+    print(f"{summary['samples']} samples | CER {summary['avg_cer']:.3f} (corpus {summary['micro_cer']:.3f}) | "
+          f"WER {summary['avg_wer']:.3f} (corpus {summary['micro_wer']:.3f})")
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+import tracing
+from asr_backends import load_asr_model
+
+
+def default_device() -> str:
+    """
+    Pick the device Whisper should run on.
+    :return: 'cuda' if a GPU is available, otherwise 'cpu'.
+    """
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def model_size_mb(model) -> float:
+    """
+    Estimate the resident size of a model from its state dict, including quantized weights.
+    :param model: A loaded model.
+    :return: The approximate size of the model in megabytes.
+    """
+    if not isinstance(model, torch.nn.Module):
+        return getattr(model, 'size_mb', 0.0)
+
+    def tensor_bytes(value) -> int:
+        if isinstance(value, torch.Tensor):
+            return value.numel() * value.element_size()
+        if isinstance(value, (tuple, list)):
+            return sum(tensor_bytes(v) for v in value)
+        return 0
+
+    return sum(tensor_bytes(value) for value in model.state_dict().values()) / (1024 ** 2)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of resident Whisper models keyed on (model size, device, inference backend).
+
+    Each model is loaded once and then reused by every caller in the process, which for the Streamlit app means
+    across reruns and sessions. The least recently used model is evicted once either the model count or the
+    memory budget is exceeded. Loads are serialized per key, so a cold load never blocks callers of other models.
+    """
+
+    def __init__(self, max_models: int = 2, memory_budget_mb: float | None = None):
+        """
+        :param max_models: The maximum number of models kept resident at once.
+        :param memory_budget_mb: An optional cap on the combined size of resident models in megabytes.
+        """
+        self.max_models = max_models
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = {}
+
+    def get(self, size: str = 'medium', device: str | None = None, backend: str = 'whisper'):
+        """
+        Return a resident Whisper model, loading it on first use.
+        :param size: A string corresponding to the Whisper model size, e.g. 'medium'.
+        :param device: A string corresponding to the device, e.g. 'cpu' or 'cuda'. Defaults to the best available.
+        :param backend: A key of ASR_BACKENDS selecting the inference backend.
+        :return: The loaded model.
+        """
+        # dynamic quantization only runs on the CPU
+        device = 'cpu' if backend == 'whisper-int8' else device or default_device()
+        key = (size, device, backend)
+
+        model = self._lookup(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # another caller may have loaded the model while this one waited
+            model = self._lookup(key)
+            if model is not None:
+                return model
+
+            start = time.perf_counter()
+            with tracing.span('model_load', model='/'.join(key)):
+                model = load_asr_model(*key)
+            size_mb = model_size_mb(model)
+            tracing.annotate(asr_model='/'.join(key))
+
+            with self._lock:
+                self.misses += 1
+                self.load_seconds[key] = time.perf_counter() - start
+                self._models[key] = model
+                self._sizes[key] = size_mb
+                self._evict()
+                self._load_locks.pop(key, None)
+
+            return model
+
+    def _lookup(self, key: tuple[str, str, str]):
+        """
+        Fetch a resident model and mark it as most recently used.
+        :param key: A (model size, device, backend) tuple.
+        :return: The model, or None if it is not resident.
+        """
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                return None
+            self._models.move_to_end(key)
+            self.hits += 1
+        tracing.annotate(asr_model='/'.join(key))
+        return model
+
+    def _evict(self) -> None:
+        """
+        Drop least recently used models until the registry fits its count and memory limits.
+        The most recently used model is always kept.
+        """
+        while len(self._models) > 1 and (
+            len(self._models) > self.max_models
+            or (self.memory_budget_mb is not None and sum(self._sizes.values()) > self.memory_budget_mb)
+        ):
+            key, model = self._models.popitem(last=False)
+            del self._sizes[key]
+            del model
+            self.evictions += 1
+            if key[1] == 'cuda':
+                torch.cuda.empty_cache()
+
+    def clear(self) -> None:
+        """
+        Unload every resident model.
+        """
+        with self._lock:
+            self._models.clear()
+            self._sizes.clear()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def stats(self) -> dict:
+        """
+        Summarize registry usage.
+        :return: A dict containing hit/miss/eviction counters, per-model load times, and resident models with sizes.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total > 0 else 0.0,
+                'load_seconds': {'/'.join(key): secs for key, secs in self.load_seconds.items()},
+                'resident': {'/'.join(key): round(mb, 1) for key, mb in self._sizes.items()}
+            }
+
+
+_budget = os.getenv('WHISPER_MEMORY_BUDGET_MB')
+
+registry = ModelRegistry(
+    max_models=int(os.getenv('WHISPER_MAX_MODELS', '2')),
+    memory_budget_mb=float(_budget) if _budget else None
+)
+
+
+def get_model(size: str = 'medium', device: str | None = None, backend: str | None = None):
+    """
+    Fetch a Whisper model from the shared process-wide registry.
+    :param size: A string corresponding to the Whisper model size.
+    :param device: A string corresponding to the device. Defaults to the best available.
+    :param backend: A key of ASR_BACKENDS. Defaults to the ASR_BACKEND environment variable, or 'whisper'.
+    :return: The loaded model.
+    """
+    return registry.get(size, device, backend or os.getenv('ASR_BACKEND', 'whisper'))
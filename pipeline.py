@@ -0,0 +1,179 @@
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable
+
+import numpy as np
+
+import tracing
+from tracing import Trace
+
+DEFAULT_CONVERSATION = 'default'
+
+
+def message_languages(user: str, user_1_language: str, user_2_language: str) -> tuple[str, str]:
+    """
+    Work out which way a user's message is translated.
+    :param user: A string corresponding to the user who sent the message: 'User 1' or 'User 2'.
+    :param user_1_language: A string corresponding to User 1's preferred language.
+    :param user_2_language: A string corresponding to User 2's preferred language.
+    :return: A tuple containing the source language and the target language.
+    """
+    if user == 'User 1':
+        return user_1_language, user_2_language
+    return user_2_language, user_1_language
+
+
+@dataclass
+class Job:
+    """
+    A single message moving through the pipeline. Stages fill in the text fields and record their timings.
+    """
+    user: str
+    payload: str | np.ndarray
+    mode: str
+    source_language: str
+    target_language: str
+    user_1_language: str
+    user_2_language: str
+    script: str
+    conversation_id: str = DEFAULT_CONVERSATION
+    stream: bool = False
+    backend: str | None = None
+    asr_backend: str | None = None
+    asr_profile: str | None = None
+    # the recorded waveform behind a message transcribed before submission, archived in place of the payload
+    audio: np.ndarray | None = None
+    raw_text: str = ''
+    translated_text: str = ''
+    message_id: int | None = None
+    persisted: Future | None = None
+    timings: dict = field(default_factory=dict)
+    trace: Trace = field(default_factory=Trace)
+    profile: bool = False
+    error: str | None = None
+    done: threading.Event = field(default_factory=threading.Event)
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+
+class Pipeline:
+    """
+    A chain of worker pools connected by bounded queues.
+
+    Every stage runs on its own threads, so one message can be translated while the next one is being transcribed and
+    the one before it is being written to the database. With a single worker per stage (the default) messages stay in
+    submission order. When a queue is full, `submit` blocks until the stage catches up, or gives up after `timeout`.
+    """
+
+    def __init__(
+        self,
+        stages: list[tuple[str, Callable[[Job], None]]],
+        maxsize: int = 8,
+        workers: dict[str, int] | None = None
+    ):
+        """
+        :param stages: A list of (name, function) pairs, run in order on every job.
+        :param maxsize: The capacity of the queue in front of each stage.
+        :param workers: An optional mapping from stage name to its number of worker threads. Defaults to one each.
+        """
+        self.names = [name for name, _ in stages]
+        self.queues = [queue.Queue(maxsize=maxsize) for _ in stages]
+        self.threads = []
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+        for i, (name, function) in enumerate(stages):
+            next_queue = self.queues[i + 1] if i + 1 < len(stages) else None
+            for n in range((workers or {}).get(name, 1)):
+                thread = threading.Thread(
+                    target=self._run_stage,
+                    args=(name, function, self.queues[i], next_queue),
+                    name=f'pipeline-{name}-{n}',
+                    daemon=True
+                )
+                thread.start()
+                self.threads.append(thread)
+
+    def _run_stage(self, name: str, function: Callable[[Job], None], inbox: queue.Queue,
+                   outbox: queue.Queue | None) -> None:
+        """
+        Worker loop for one stage. Jobs that failed in an earlier stage are passed through untouched.
+        """
+        while True:
+            job, queued_at = inbox.get()
+            start = time.perf_counter()
+            job.timings[f'{name}_wait'] = start - queued_at
+            job.trace.add(f'{name}_wait', start - queued_at, queued_at)
+
+            if job.error is None:
+                try:
+                    with tracing.activate(job.trace), job.trace.span(name):
+                        if job.profile:
+                            tracing.profiled(function, job, label=name)
+                        else:
+                            function(job)
+                except Exception:
+                    job.error = traceback.format_exc()
+                job.timings[name] = time.perf_counter() - start
+
+            if outbox is None:
+                job.timings['total'] = time.perf_counter() - job.submitted_at
+                tracing.finish(
+                    job.trace, user=job.user, conversation_id=job.conversation_id, failed=job.error is not None
+                )
+                with self._lock:
+                    if job.error is None:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                job.done.set()
+            else:
+                outbox.put((job, time.perf_counter()))
+
+    def submit(self, job: Job, timeout: float | None = None) -> Job:
+        """
+        Queue a job at the first stage.
+        :param job: The job to process.
+        :param timeout: How long in seconds to wait for room in the first queue. Waits indefinitely by default.
+        :return: The same job, which is marked done once it has passed through every stage.
+        :raises queue.Full: If the first queue is still full after `timeout` seconds.
+        """
+        try:
+            self.queues[0].put((job, time.perf_counter()), timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise
+        with self._lock:
+            self.submitted += 1
+        return job
+
+    def backlog(self) -> dict[str, int]:
+        """
+        Report how many jobs are waiting in front of each stage.
+        :return: A dict mapping each stage name to its queue length.
+        """
+        return {name: q.qsize() for name, q in zip(self.names, self.queues)}
+
+    def stats(self) -> dict:
+        """
+        Summarize pipeline usage.
+        :return: A dict containing job counters, the number of jobs in flight, the backlog, and worker liveness.
+        """
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'in_flight': self.submitted - self.completed - self.failed,
+                'backlog': self.backlog(),
+                'workers_alive': sum(thread.is_alive() for thread in self.threads),
+                'workers': len(self.threads)
+            }
@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import time
+
+from asr_backends import ASR_BACKENDS, DECODE_PROFILES
+from database import init_db
+from engine import ASR_PROMPTS, retranscribe_messages
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='retranscribe.py',
+        description='Bulk re-transcription of stored messages from the audio archived in AUDIO_STORE_DIR.'
+    )
+    parser.add_argument(
+        'output',
+        type=str,
+        help='A string representing the name of the output file: a .txt file with one transcription per line, in '
+             'message order, for evaluate_whisper.py, or a .jsonl file with the previous and new transcriptions.'
+    )
+    parser.add_argument(
+        '-c', '--conversation',
+        type=str,
+        default=None,
+        help='A string representing the conversation to re-transcribe. Defaults to every conversation.'
+    )
+    parser.add_argument(
+        '-s', '--script',
+        type=str,
+        default='Traditional 繁體字',
+        choices=list(ASR_PROMPTS),
+        help="A string representing the Chinese script whose prompt is given to Whisper."
+    )
+    parser.add_argument(
+        '-a', '--asr-backend',
+        type=str,
+        default='whisper',
+        choices=list(ASR_BACKENDS),
+        help='A string representing the inference backend used to run the Whisper checkpoint.'
+    )
+    parser.add_argument(
+        '--profile',
+        type=str,
+        default='balanced',
+        choices=list(DECODE_PROFILES),
+        help='A string representing the decoding profile.'
+    )
+    parser.add_argument(
+        '-n', '--dry-run',
+        action='store_true',
+        help='A boolean determining whether the stored transcriptions should be left unchanged.'
+    )
+    args = parser.parse_args()
+
+    init_db()
+
+    as_jsonl = os.path.splitext(args.output)[1] == '.jsonl'
+    changed = 0
+    count = 0
+    start = time.perf_counter()
+
+    with open(args.output, 'w', newline='', encoding='utf-8') as f:
+        results = retranscribe_messages(
+            args.script, args.conversation, args.asr_backend, args.profile, write=not args.dry_run
+        )
+        for count, result in enumerate(results, start=1):
+            f.write(json.dumps(result, ensure_ascii=False) + '\n' if as_jsonl else f"{result['raw_text'].strip()}\n")
+            changed += result['raw_text'] != result['previous']
+            print(result['id'], result['raw_text'])
+
+    elapsed = time.perf_counter() - start
+    print(f'Re-transcribed {count} messages in {elapsed:.1f}s, {changed} changed')
@@ -0,0 +1,189 @@
+import os
+import re
+from functools import lru_cache
+
+import script_tables
+
+# the conversion targets: Simplified Chinese and Hong Kong Traditional Chinese
+SIMPLIFIED = 'simplified'
+TRADITIONAL = 'traditional'
+
+# OpenCC dictionary files merged into the built-in tables when OPENCC_DICT_DIR is set
+OPENCC_FILES = {
+    'characters': 'STCharacters.txt',
+    'phrases': 'STPhrases.txt',
+    'hk_variants': 'HKVariants.txt',
+    'traditional_characters': 'TSCharacters.txt',
+    'traditional_phrases': 'TSPhrases.txt'
+}
+
+
+def parse_characters(text: str) -> dict[str, str]:
+    """
+    Parse a table of "簡繁" character pairs.
+    :param text: Whitespace-separated pairs as written in script_tables.py.
+    :return: A dict mapping each character to its converted form.
+    """
+    return {pair[0]: pair[1] for pair in text.split()}
+
+
+def parse_phrases(text: str) -> dict[str, str]:
+    """
+    Parse a table of "簡體 繁體" phrase pairs.
+    :param text: Whitespace-separated phrases as written in script_tables.py, each followed by its converted form.
+    :return: A dict mapping each phrase to its converted form.
+    """
+    items = text.split()
+    return dict(zip(items[::2], items[1::2]))
+
+
+def read_opencc_file(path: str) -> dict[str, str]:
+    """
+    Read an OpenCC dictionary file, in which each line is a source string, a tab and its space-separated conversions.
+    :param path: The path of the file.
+    :return: A dict mapping each source string to its first conversion.
+    """
+    table = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            source, _, targets = line.rstrip('\n').partition('\t')
+            if source and targets:
+                table[source] = targets.split(' ')[0]
+    return table
+
+
+def load_tables() -> dict[str, dict[str, str]]:
+    """
+    Load the built-in conversion tables, extended by the OpenCC dictionaries in OPENCC_DICT_DIR if it is set.
+    :return: A dict mapping each table name in OPENCC_FILES to its entries.
+    """
+    tables = {
+        'characters': parse_characters(script_tables.CHARACTERS),
+        'phrases': parse_phrases(script_tables.PHRASES),
+        'hk_variants': parse_characters(script_tables.HK_VARIANTS),
+        'traditional_characters': parse_characters(script_tables.TRADITIONAL_VARIANTS),
+        'traditional_phrases': parse_phrases(script_tables.TRADITIONAL_PHRASES)
+    }
+
+    dict_dir = os.getenv('OPENCC_DICT_DIR')
+    if dict_dir:
+        for name, file_name in OPENCC_FILES.items():
+            path = os.path.join(dict_dir, file_name)
+            if os.path.exists(path):
+                tables[name].update(read_opencc_file(path))
+
+    return tables
+
+
+class Converter:
+    """
+    Converts text from one script to the other with precomputed lookup tables: phrases are matched longest first, and
+    everything between them is converted character by character with str.translate.
+    """
+
+    def __init__(self, characters: dict[str, str], phrases: dict[str, str]):
+        """
+        :param characters: A dict mapping single characters to their converted forms.
+        :param phrases: A dict mapping multi-character phrases to their converted forms.
+        """
+        self.table = str.maketrans(characters)
+        self.phrases = phrases
+        self.keys = set(characters) | {phrase[0] for phrase in phrases}
+        # longest phrases first, so that e.g. 方便面 wins over 便面
+        alternatives = sorted(phrases, key=len, reverse=True)
+        self.pattern = re.compile('(' + '|'.join(map(re.escape, alternatives)) + ')') if alternatives else None
+
+    def __call__(self, text: str) -> str:
+        """
+        Convert a string.
+        :param text: The text to convert.
+        :return: The converted text.
+        """
+        if text.isascii() or self.keys.isdisjoint(text):
+            return text
+        if self.pattern is None:
+            return text.translate(self.table)
+
+        # split() alternates between text outside phrases (even indices) and matched phrases (odd indices)
+        parts = self.pattern.split(text)
+        return ''.join(
+            self.phrases[part] if i % 2 else part.translate(self.table)
+            for i, part in enumerate(parts)
+        )
+
+
+def build_converters() -> dict[str, Converter]:
+    """
+    Build a converter for each target script.
+    :return: A dict mapping SIMPLIFIED and TRADITIONAL to their converters.
+    """
+    tables = load_tables()
+    hk = tables['hk_variants']
+
+    def to_hk(text: str) -> str:
+        return ''.join(hk.get(char, char) for char in text)
+
+    characters = {s: to_hk(t) for s, t in tables['characters'].items()}
+    phrases = {s: to_hk(t) for s, t in tables['phrases'].items()}
+
+    # Traditional -> Simplified reverses the tables above; for characters with several Traditional forms, the phrases
+    # supply the forms the character table does not
+    reverse = {t: s for s, t in tables['characters'].items()}
+    for s, t in tables['phrases'].items():
+        if len(s) == len(t):
+            for s_char, t_char in zip(s, t):
+                reverse.setdefault(t_char, s_char)
+    reverse.update({h: reverse.get(t, t) for t, h in hk.items()})
+    reverse.update(tables['traditional_characters'])
+    reverse = {t: s for t, s in reverse.items() if t != s}
+
+    reverse_phrases = {t: s for s, t in tables['phrases'].items() if len(t) > 1}
+    reverse_phrases.update({to_hk(t): s for t, s in reverse_phrases.items()})
+    reverse_phrases.update(tables['traditional_phrases'])
+
+    # a phrase only needs its own entry if converting it character by character would give something else
+    forward_table, reverse_table = str.maketrans(characters), str.maketrans(reverse)
+    phrases = {s: t for s, t in phrases.items() if s.translate(forward_table) != t}
+    reverse_phrases = {t: s for t, s in reverse_phrases.items() if t.translate(reverse_table) != s}
+
+    return {TRADITIONAL: Converter(characters, phrases), SIMPLIFIED: Converter(reverse, reverse_phrases)}
+
+
+converters = build_converters()
+
+
+@lru_cache(maxsize=4096)
+def convert(text: str, target: str) -> str:
+    """
+    Convert text to a script. Results are memoized, since the chat history is re-rendered on every Streamlit rerun.
+    :param text: The text to convert, in either script. Non-Chinese text is returned unchanged.
+    :param target: SIMPLIFIED or TRADITIONAL.
+    :return: The converted text.
+    """
+    return converters[target](text)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog='script_convert.py',
+        description='Converts text between Simplified and Traditional (Hong Kong) Chinese.'
+    )
+    parser.add_argument(
+        '-t', '--target',
+        type=str,
+        choices=[SIMPLIFIED, TRADITIONAL],
+        default=TRADITIONAL,
+        help='A string representing the script to convert to.'
+    )
+    parser.add_argument(
+        'text',
+        type=str,
+        nargs='*',
+        help='The text to convert. Defaults to reading standard input.'
+    )
+    args = parser.parse_args()
+
+    print(convert(' '.join(args.text) if args.text else sys.stdin.read(), args.target))
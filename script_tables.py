@@ -0,0 +1,102 @@
+# Conversion tables for script_convert.py, in the spirit of OpenCC's dictionaries. Characters that are written the same
+# way in both scripts are not listed. Set OPENCC_DICT_DIR to extend these with OpenCC's full dictionary files.
+
+# Simplified -> Traditional single characters as "簡繁" pairs. Characters with several Traditional forms map to the
+# most common one; PHRASES covers the other readings.
+CHARACTERS = '''
+万萬 与與 丑醜 专專 业業 丛叢 东東 丝絲 丢丟 两兩 严嚴 丧喪 个個 丰豐 临臨 为為 丽麗 举舉 么麼 义義 乌烏
+乐樂 乔喬 习習 乡鄉 书書 买買 乱亂 争爭 于於 亏虧 云雲 亚亞 产產 亩畝 亲親 亵褻 亿億 仅僅 从從 仑侖 仓倉
+仪儀 们們 价價 众眾 优優 会會 伛傴 伞傘 伟偉 传傳 伤傷 伦倫 伪偽 体體 余餘 佣傭 侠俠 侣侶 侥僥 侦偵 侧側
+侨僑 侩儈 侬儂 俭儉 俩倆 债債 倾傾 偻僂 偿償 储儲 儿兒 党黨 兰蘭 关關 兴興 养養 兽獸 内內 冈岡 册冊 写寫
+军軍 农農 冯馮 冲衝 决決 况況 冻凍 净淨 凉涼 减減 凑湊 几幾 凤鳳 凭憑 凯凱 击擊 凶兇 刘劉 则則 刚剛 创創
+删刪 别別 刹剎 刽劊 剂劑 剐剮 剑劍 剥剝 剧劇 劝勸 办辦 务務 动動 励勵 劲勁 劳勞 势勢 勋勳 勚勩 匀勻 区區
+医醫 华華 协協 单單 卖賣 卢盧 卤滷 卫衛 却卻 厂廠 厅廳 历歷 厉厲 压壓 厌厭 厕廁 县縣 参參 双雙 发發 变變
+叙敘 叠疊 号號 叹嘆 吓嚇 吕呂 吗嗎 吨噸 听聽 启啟 吴吳 呐吶 员員 呕嘔 呗唄 呛嗆 呜嗚 咏詠 咙嚨 咸鹹 响響
+哑啞 哗嘩 哟喲 唛嘜 唠嘮 唤喚 啧嘖 啬嗇 啰囉 啸嘯 喷噴 喽嘍 嗳噯 嘘噓 嘱囑 团團 园園 围圍 国國 图圖 圆圓
+圣聖 场場 坏壞 块塊 坚堅 坛壇 坝壩 坟墳 坠墜 垄壟 垒壘 垦墾 堑塹 墙牆 壮壯 声聲 壳殼 处處 备備 复復 头頭
+夸誇 夹夾 夺奪 奋奮 奖獎 妆妝 妇婦 妈媽 娱娛 娄婁 娇嬌 婴嬰 婶嬸 孙孫 学學 宁寧 宝寶 实實 宠寵 审審 宪憲
+宽寬 宾賓 对對 寻尋 导導 寿壽 将將 尔爾 尘塵 尝嘗 尧堯 尴尷 尸屍 层層 屉屜 届屆 属屬 岁歲 岂豈 岗崗 岛島
+岭嶺 峡峽 崭嶄 巩鞏 币幣 师師 帐帳 帘簾 帜幟 带帶 帮幫 并並 广廣 庄莊 庆慶 庐廬 库庫 应應 庙廟 废廢 开開
+异異 弃棄 张張 弥彌 弯彎 弹彈 强強 归歸 当當 录錄 彦彥 彻徹 径徑 忆憶 忧憂 怀懷 态態 怜憐 总總 恋戀 恒恆
+恳懇 恶惡 恼惱 悦悅 悬懸 惊驚 惧懼 惨慘 惩懲 惫憊 惭慚 惯慣 愤憤 愿願 懒懶 戏戲 战戰 户戶 扑撲 执執 扩擴
+扫掃 扬揚 扰擾 抚撫 抛拋 抢搶 护護 报報 担擔 拟擬 拢攏 拣揀 拥擁 拦攔 拨撥 择擇 挂掛 挚摯 挡擋 挣掙 挤擠
+挥揮 捞撈 损損 换換 捡撿 据據 掳擄 掷擲 揽攬 搀攙 搁擱 搂摟 搅攪 携攜 摄攝 摆擺 摇搖 摊攤 撑撐 撵攆 擞擻
+敌敵 数數 斋齋 无無 旧舊 时時 旷曠 昼晝 显顯 晋晉 晒曬 晓曉 暂暫 术術 机機 杀殺 杂雜 权權 条條 来來 杨楊
+杰傑 极極 构構 枪槍 柜櫃 标標 栈棧 栋棟 栏欄 树樹 样樣 桥橋 档檔 梦夢 检檢 椭橢 楼樓 榄欖 槛檻 欢歡 欧歐
+歼殲 残殘 毁毀 毕畢 毙斃 气氣 汇匯 汉漢 汤湯 沟溝 没沒 沪滬 泪淚 泼潑 泽澤 洁潔 洒灑 浅淺 测測 济濟 浏瀏
+浓濃 涂塗 涛濤 润潤 涨漲 渊淵 渐漸 渔漁 温溫 湾灣 湿濕 溃潰 溅濺 滚滾 满滿 滤濾 滥濫 滨濱 灭滅 灯燈 灵靈
+灾災 灿燦 炉爐 点點 炼煉 烂爛 烟煙 烦煩 烧燒 烫燙 热熱 焕煥 爱愛 爷爺 牵牽 犹猶 状狀 独獨 狭狹 狮獅 猎獵
+猪豬 猫貓 献獻 环環 现現 玛瑪 琐瑣 电電 画畫 畅暢 疗療 疮瘡 疯瘋 痒癢 瘫癱 癣癬 皱皺 盏盞 盐鹽 监監 盖蓋
+盗盜 盘盤 睁睜 矫矯 矿礦 码碼 础礎 硕碩 确確 碍礙 礼禮 祷禱 祸禍 离離 秃禿 积積 称稱 稳穩 穷窮 窃竊 窍竅
+竞競 笔筆 笋筍 笼籠 筑築 筛篩 签簽 简簡 箩籮 篮籃 类類 粮糧 紧緊 纠糾 红紅 纤纖 约約 级級 纪紀 纯純 纱紗
+纲綱 纳納 纵縱 纷紛 纸紙 纹紋 纺紡 纽紐 线線 练練 组組 绅紳 细細 织織 终終 绍紹 经經 绑綁 绒絨 结結 绕繞
+绘繪 给給 络絡 绝絕 统統 绢絹 绣繡 继繼 绩績 绪緒 续續 绳繩 维維 绵綿 绷繃 绸綢 综綜 绿綠 缀綴 缓緩 编編
+缘緣 缝縫 缠纏 缩縮 缴繳 网網 罗羅 罚罰 罢罷 职職 联聯 聪聰 肃肅 肠腸 肤膚 肾腎 肿腫 胀脹 胁脅 胜勝 胆膽
+脏髒 脑腦 脚腳 脸臉 腊臘 腌醃 腻膩 舆輿 舰艦 舱艙 艰艱 艳艷 艺藝 节節 芦蘆 苍蒼 苏蘇 苹蘋 茎莖 荐薦 荡蕩
+荣榮 药藥 莱萊 获獲 营營 萧蕭 萨薩 蓝藍 蔼藹 虏虜 虑慮 虚虛 虫蟲 虽雖 虾蝦 蚀蝕 蚁蟻 蛮蠻 蜡蠟 蝇蠅 补補
+衬襯 袜襪 装裝 见見 观觀 规規 视視 览覽 觉覺 触觸 誉譽 计計 订訂 认認 讥譏 讨討 让讓 训訓 议議 讯訊 记記
+讲講 讶訝 许許 论論 讽諷 设設 访訪 证證 评評 识識 诈詐 诉訴 诊診 词詞 译譯 试試 诗詩 诚誠 话話 诞誕 询詢
+该該 详詳 误誤 诱誘 说說 请請 诸諸 诺諾 读讀 课課 谁誰 调調 谅諒 谈談 谊誼 谋謀 谎謊 谐諧 谓謂 谜謎 谢謝
+谣謠 谦謙 谨謹 谱譜 谂諗 谷穀 贝貝 负負 贡貢 财財 责責 贤賢 败敗 账賬 货貨 质質 贩販 贪貪 贫貧 购購 贯貫
+贱賤 贴貼 贵貴 贷貸 贸貿 费費 贺賀 资資 赋賦 赌賭 赏賞 赔賠 赖賴 赚賺 赛賽 赞贊 赠贈 赢贏 赵趙 赶趕 趋趨
+跃躍 践踐 踪蹤 躯軀 车車 轨軌 转轉 轮輪 软軟 轰轟 轻輕 载載 轿轎 较較 辅輔 辆輛 辈輩 输輸 辑輯 辞辭 边邊
+辽遼 达達 迁遷 过過 迈邁 运運 还還 这這 进進 远遠 违違 连連 迟遲 适適 选選 逊遜 递遞 逻邏 遗遺 遥遙 邓鄧
+邮郵 邻鄰 郑鄭 酱醬 酿釀 释釋 针針 钉釘 钓釣 钙鈣 钞鈔 钟鐘 钢鋼 钥鑰 钩鉤 钱錢 钻鑽 铁鐵 铃鈴 铅鉛 铜銅
+铝鋁 铲鏟 银銀 铺鋪 链鏈 销銷 锁鎖 锅鍋 锋鋒 锐銳 错錯 锡錫 锦錦 键鍵 锻鍛 镇鎮 镜鏡 长長 门門 闪閃 闭閉
+问問 闯闖 闲閒 间間 闷悶 闸閘 闹鬧 闻聞 阅閱 阔闊 队隊 阳陽 阴陰 阵陣 阶階 际際 陆陸 陈陳 险險 随隨 隐隱
+隶隸 难難 雏雛 雾霧 靓靚 页頁 顶頂 项項 顺順 须須 顽頑 顾顧 顿頓 预預 领領 频頻 颗顆 题題 颜顏 额額 风風
+飘飄 飞飛 饥飢 饭飯 饮飲 饰飾 饱飽 饲飼 饺餃 饼餅 饿餓 馆館 馒饅 马馬 驱驅 驳駁 驶駛 驻駐 驾駕 验驗 骂罵
+骑騎 骗騙 骚騷 鱼魚 鲁魯 鲜鮮 鲸鯨 鸟鳥 鸡雞 鸣鳴 鸭鴨 鸽鴿 鹅鵝 鹰鷹 齐齊 齿齒 龄齡 龙龍 龟龜 揾搵 系係
+仆僕 占佔 采採 郁鬱 范範 尽儘 准準 干乾 后後 里裏
+'''
+
+# Simplified -> Traditional phrases whose characters convert differently from CHARACTERS.
+PHRASES = '''
+头发 頭髮 理发 理髮 发型 髮型 白发 白髮 金发 金髮 剪发 剪髮 洗发 洗髮 假发 假髮 毛发 毛髮
+干部 幹部 干活 幹活 能干 能幹 干嘛 幹嘛 干什么 幹什麼 干涉 干涉 干扰 干擾 干预 干預 若干 若干 相干 相干
+皇后 皇后 王后 王后 太后 太后 天后 天后
+公里 公里 英里 英里 海里 海里 千里 千里 万里 萬里 里程 里程 邻里 鄰里 故里 故里
+面条 麵條 面包 麵包 面粉 麵粉 拉面 拉麵 方便面 方便麵 炒面 炒麵 汤面 湯麵 面食 麵食 食面 食麵 吃面 吃麵
+一只 一隻 两只 兩隻 三只 三隻 几只 幾隻 这只 這隻 那只 那隻
+台风 颱風 钟意 鍾意 钟情 鍾情 钟爱 鍾愛
+复杂 複雜 复制 複製 重复 重複 复习 複習 复印 複印 复数 複數 复合 複合 反复 反覆 答复 答覆 回复 回覆
+日历 日曆 历法 曆法 农历 農曆 阳历 陽曆 阴历 陰曆 挂历 掛曆
+冲凉 沖涼 冲茶 沖茶 冲洗 沖洗 冲水 沖水 冲咖啡 沖咖啡
+系统 系統 系列 系列 体系 體系 系数 系數 派系 派系 星系 星系 银河系 銀河系 语系 語系 科系 科系 院系 院系
+联系 聯繫 维系 維繫 关系 關係
+批准 批准 准许 准許 不准 不准 准予 准予
+制度 制度 制造 製造 制作 製作 制品 製品 绘制 繪製 录制 錄製
+特征 特徵 征求 徵求 象征 象徵 征收 徵收
+胡须 鬍鬚 胡子 鬍子
+稻谷 稻穀 谷物 穀物 山谷 山谷 峡谷 峽谷 谷底 谷底
+杂志 雜誌 标志 標誌 日志 日誌 手表 手錶 钟表 鐘錶 老板 老闆
+尽量 盡量 尽力 盡力 尽快 盡快 尽头 盡頭 尽管 儘管
+收获 收穫 家伙 傢伙 伙伴 夥伴 合伙 合夥
+奋斗 奮鬥 战斗 戰鬥 斗争 鬥爭 打斗 打鬥 斗嘴 鬥嘴
+划船 划船 划算 划算 计划 計劃 规划 規劃 策划 策劃
+标签 標籤 抽签 抽籤 书签 書籤
+仆人 僕人 占卜 占卜 风采 風采 神采 神采 文采 文采 忧郁 憂鬱 郁闷 鬱悶
+恶心 噁心 精致 精緻 细致 細緻 周末 週末 一周 一週
+游泳 游泳 游水 游水 上游 上游 下游 下游 旅游 旅遊 游戏 遊戲 游客 遊客
+宣布 宣佈 公布 公佈 分布 分佈 布置 佈置 注册 註冊 注明 註明 注释 註釋
+舍不得 捨不得 舍得 捨得 舍弃 捨棄 取舍 取捨 宿舍 宿舍
+放松 放鬆 轻松 輕鬆 宽松 寬鬆 松开 鬆開 松弛 鬆弛
+心脏 心臟 内脏 內臟 肝脏 肝臟 肾脏 腎臟
+饼干 餅乾 干净 乾淨 干杯 乾杯 干燥 乾燥
+后来 後來 以后 以後 后面 後面 之后 之後 然后 然後 最后 最後
+'''
+
+# Hong Kong forms of standard Traditional characters, as "標港" pairs.
+HK_VARIANTS = '''
+線綫 衛衞 啟啓
+'''
+
+# Traditional -> Simplified for variant forms with no Simplified -> Traditional entry of their own.
+TRADITIONAL_VARIANTS = '''
+裡里 爲为 衆众 僞伪 鑑鉴 豔艳 閑闲 饑饥 麪面 麽么 嚐尝 臺台 檯台
+'''
+
+# Traditional -> Simplified phrases that CHARACTERS, read backwards, would get wrong.
+TRADITIONAL_PHRASES = '''
+乾隆 乾隆 乾坤 乾坤 著作 著作 著名 著名 顯著 显著
+'''
@@ -0,0 +1,321 @@
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import queue
+import sys
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+import tracing
+from audio_utils import wav_bytes_to_float32
+from database import DEFAULT_CONVERSATION, Session, delete_conversation, init_db, load_messages
+from engine import create_pipeline, forget_prompt, retranslate_conversation, translate_texts
+from pipeline import Job
+from translation_backend import backend_stats
+from translation_cache import translation_cache
+
+logger = logging.getLogger(__name__)
+
+# seconds to wait for room in the pipeline before answering 503
+SUBMIT_TIMEOUT = float(os.getenv('SERVICE_SUBMIT_TIMEOUT_SECONDS', '1'))
+
+# seconds between partial updates of a streamed response
+STREAM_INTERVAL = 0.05
+
+init_db()
+
+# message IDs are assigned as messages are persisted and history is ordered by ID, so more than one worker per stage
+# lets a conversation's messages be stored in a different order from the one they were sent in
+pipeline = create_pipeline(
+    asr_workers=int(os.getenv('SERVICE_ASR_WORKERS', '1')),
+    translate_workers=int(os.getenv('SERVICE_TRANSLATE_WORKERS', '1')),
+    maxsize=int(os.getenv('SERVICE_QUEUE_SIZE', '32'))
+)
+
+app = FastAPI(title='Cantonese-English Translator')
+
+
+class MessageRequest(BaseModel):
+    """
+    A message to transcribe and/or translate. Exactly one of `text` and `audio` must be set.
+    """
+    user: str
+    source_language: str
+    target_language: str
+    user_1_language: str
+    user_2_language: str
+    script: str
+    text: str | None = None
+    # base64-encoded WAV file
+    audio: str | None = None
+    conversation_id: str = DEFAULT_CONVERSATION
+    stream: bool = False
+    backend: str | None = None
+    asr_backend: str | None = None
+    asr_profile: str | None = None
+    # profile this message's stages with cProfile on the server
+    profile: bool = False
+
+
+class TranslationBatchRequest(BaseModel):
+    """
+    Several texts to translate in the same direction.
+    """
+    texts: list[str]
+    source_language: str
+    target_language: str
+    user_1_language: str
+    user_2_language: str
+    script: str
+    backend: str | None = None
+
+
+class RetranslateRequest(BaseModel):
+    """
+    The language settings to re-translate a stored conversation with.
+    """
+    user_1_language: str
+    user_2_language: str
+    script: str
+    backend: str | None = None
+
+
+def job_result(job: Job) -> dict:
+    """
+    Build the response body for a finished job.
+    :param job: A job that has passed through the pipeline.
+    :return: A dict containing the message ID, texts, stage timings, trace, and the error if the job failed.
+    """
+    return {
+        'id': job.message_id,
+        'user': job.user,
+        'raw_text': job.raw_text,
+        'translated_text': job.translated_text,
+        'timings': job.timings,
+        'trace': job.trace.to_dict(),
+        'error': job.error.strip().splitlines()[-1] if job.error else None
+    }
+
+
+async def wait_until_done(job: Job) -> None:
+    """
+    Wait for a job to leave the pipeline by polling, so that waiting requests never hold a thread of the default
+    executor, which submitting and decoding audio need.
+    :param job: A job that has been submitted to the pipeline.
+    """
+    while not job.done.is_set():
+        await asyncio.sleep(STREAM_INTERVAL)
+
+
+async def wait_until_saved(job: Job) -> None:
+    """
+    Wait for a finished job to be committed so that its message ID can be returned. A failed commit is recorded as the
+    job's error.
+    :param job: A job that has passed through the pipeline.
+    """
+    if job.persisted is not None:
+        try:
+            await asyncio.wrap_future(job.persisted)
+        except Exception as e:
+            logger.exception('Message from %s could not be saved', job.user)
+            if job.error is None:
+                job.error = f'The message could not be saved: {e!r}'
+
+
+async def stream_job(job: Job):
+    """
+    Stream a job's progress as newline-delimited JSON, one line per change, ending with the full result.
+    :param job: A job that has been submitted to the pipeline.
+    :return: An async iterator over the lines of the response.
+    """
+    last = None
+    while not job.done.is_set():
+        current = (job.raw_text, job.translated_text)
+        if current != last and any(current):
+            update = {'raw_text': job.raw_text, 'translated_text': job.translated_text}
+            yield json.dumps(update, ensure_ascii=False) + '\n'
+            last = current
+        await asyncio.sleep(STREAM_INTERVAL)
+
+    await wait_until_saved(job)
+    yield json.dumps({**job_result(job), 'done': True}, ensure_ascii=False) + '\n'
+
+
+@app.post('/messages')
+async def post_message(request: MessageRequest):
+    """
+    Run a message through the ASR, translation and persistence stages.
+    Responds with the finished message, or with newline-delimited JSON updates if `stream` is set.
+    """
+    if (request.text is None) == (request.audio is None):
+        raise HTTPException(status_code=422, detail='Send exactly one of text and audio.')
+
+    if request.audio is not None:
+        payload = await asyncio.to_thread(wav_bytes_to_float32, base64.b64decode(request.audio))
+        mode = 'transcribe'
+    else:
+        payload, mode = request.text, 'translate'
+
+    job = Job(
+        user=request.user,
+        payload=payload,
+        mode=mode,
+        source_language=request.source_language,
+        target_language=request.target_language,
+        user_1_language=request.user_1_language,
+        user_2_language=request.user_2_language,
+        script=request.script,
+        conversation_id=request.conversation_id,
+        stream=request.stream,
+        backend=request.backend,
+        asr_backend=request.asr_backend,
+        asr_profile=request.asr_profile,
+        profile=request.profile
+    )
+
+    try:
+        await asyncio.to_thread(pipeline.submit, job, SUBMIT_TIMEOUT)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail='The service is busy.', headers={'Retry-After': '1'})
+
+    if request.stream:
+        return StreamingResponse(stream_job(job), media_type='application/x-ndjson')
+
+    await wait_until_done(job)
+    if job.error is not None:
+        logger.error('Message from %s failed:\n%s', job.user, job.error)
+        raise HTTPException(status_code=500, detail=job_result(job)['error'])
+
+    await wait_until_saved(job)
+    if job.error is not None:
+        raise HTTPException(status_code=500, detail=job_result(job)['error'])
+    return job_result(job)
+
+
+@app.post('/translations')
+async def post_translations(request: TranslationBatchRequest) -> dict:
+    """
+    Translate a batch of texts, packing cache misses into as few backend requests as possible.
+    """
+    translations = await asyncio.to_thread(
+        translate_texts, request.texts, request.source_language, request.target_language, request.user_1_language,
+        request.user_2_language, request.script, request.backend
+    )
+    return {'translations': translations}
+
+
+@app.post('/conversations/{conversation_id}/retranslate')
+async def post_retranslate(conversation_id: str, request: RetranslateRequest) -> dict:
+    """
+    Re-translate every stored message of a conversation with new language settings.
+    """
+    count = await asyncio.to_thread(
+        retranslate_conversation, conversation_id, request.user_1_language, request.user_2_language, request.script,
+        request.backend
+    )
+    return {'messages': count}
+
+
+@app.get('/conversations/{conversation_id}/messages')
+def get_messages(conversation_id: str, before_id: int | None = None, limit: int = 50) -> dict:
+    """
+    Fetch a page of a conversation's stored history, oldest first.
+    """
+    with Session() as session:
+        rows = load_messages(session, conversation_id, before_id=before_id, limit=limit)
+    return {'messages': [
+        {'id': row.id, 'user': row.user, 'raw_text': row.raw_text, 'translated_text': row.translated_text}
+        for row in rows
+    ]}
+
+
+@app.delete('/conversations/{conversation_id}')
+async def delete_messages(conversation_id: str) -> dict:
+    """
+    Delete every stored message of a conversation.
+    """
+    await asyncio.to_thread(delete_conversation, conversation_id)
+    return {'conversation_id': conversation_id}
+
+
+@app.delete('/conversations/{conversation_id}/prompt')
+def delete_prompt(conversation_id: str) -> dict:
+    """
+    Drop the ASR prompt built from a conversation's code-switched terms.
+    """
+    forget_prompt(conversation_id)
+    return {'conversation_id': conversation_id}
+
+
+@app.get('/health')
+def health() -> JSONResponse:
+    """
+    Report whether every pipeline worker is alive.
+    """
+    stats = pipeline.stats()
+    healthy = stats['workers_alive'] == stats['workers']
+    return JSONResponse(
+        {'status': 'ok' if healthy else 'degraded', 'in_flight': stats['in_flight'], 'backlog': stats['backlog']},
+        status_code=200 if healthy else 503
+    )
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def metrics() -> str:
+    """
+    Report span latency histograms, counters, and pipeline queue lengths in the Prometheus text format.
+    """
+    stats = pipeline.stats()
+    gauges = {f'pipeline_backlog_{name}': length for name, length in stats['backlog'].items()}
+    gauges.update({
+        'pipeline_in_flight': stats['in_flight'],
+        'pipeline_workers_alive': stats['workers_alive'],
+        'pipeline_rejected': stats['rejected']
+    })
+    return tracing.metrics.render(gauges)
+
+
+@app.get('/stats')
+def stats() -> dict:
+    """
+    Report pipeline, model registry, translation cache, and translation backend statistics.
+    """
+    # only report the registry once speech has been used, so that the endpoint never imports torch itself
+    model_registry = sys.modules.get('model_registry')
+
+    return {
+        'pipeline': pipeline.stats(),
+        'asr_models': model_registry.registry.stats() if model_registry is not None else None,
+        'translation_cache': translation_cache.stats(),
+        'translation_backends': backend_stats()
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='service.py',
+        description='Serves the ASR and translation pipeline over HTTP.'
+    )
+    parser.add_argument(
+        '--host',
+        type=str,
+        default='127.0.0.1',
+        help='A string representing the interface to listen on.'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8000,
+        help='An integer representing the port to listen on.'
+    )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    # a single server process, so every request shares the resident models and the pipeline's worker threads
+    uvicorn.run(app, host=args.host, port=args.port)
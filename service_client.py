@@ -0,0 +1,161 @@
+import base64
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import numpy as np
+
+from audio_utils import float32_to_wav_bytes
+from pipeline import Job
+
+
+class ServiceClient:
+    """
+    Client for the translation service with the same `submit` interface as a local Pipeline.
+
+    Each job is sent to the service on a background thread. Its text fields are filled in as the response arrives,
+    including partial translations when streaming, and it is marked done when the response is complete.
+    """
+
+    def __init__(self, base_url: str, timeout: float = 120.0, max_workers: int = 8):
+        """
+        :param base_url: The URL of the translation service, e.g. 'http://localhost:8000'.
+        :param timeout: The timeout for a single request in seconds.
+        :param max_workers: The maximum number of requests sent at once.
+        """
+        import httpx
+
+        self.client = httpx.Client(base_url=base_url, timeout=httpx.Timeout(timeout, connect=5.0))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='service-client')
+
+    def submit(self, job: Job) -> Job:
+        """
+        Send a job to the service.
+        :param job: The job to process.
+        :return: The same job, which is marked done once the service has responded.
+        """
+        self.executor.submit(self._run, job)
+        return job
+
+    @staticmethod
+    def request_body(job: Job) -> dict:
+        """
+        Build the request body for a job.
+        :param job: The job to send.
+        :return: A dict matching the service's MessageRequest.
+        """
+        body = {
+            'user': job.user,
+            'source_language': job.source_language,
+            'target_language': job.target_language,
+            'user_1_language': job.user_1_language,
+            'user_2_language': job.user_2_language,
+            'script': job.script,
+            'conversation_id': job.conversation_id,
+            'stream': job.stream,
+            'backend': job.backend,
+            'asr_backend': job.asr_backend,
+            'asr_profile': job.asr_profile,
+            'profile': job.profile
+        }
+        if isinstance(job.payload, np.ndarray):
+            body['audio'] = base64.b64encode(float32_to_wav_bytes(job.payload)).decode('ascii')
+        else:
+            body['text'] = job.payload
+        return body
+
+    @staticmethod
+    def _apply(job: Job, result: dict) -> None:
+        """
+        Copy a response onto the job.
+        """
+        job.raw_text = result.get('raw_text', job.raw_text)
+        job.translated_text = result.get('translated_text', job.translated_text)
+        job.message_id = result.get('id', job.message_id)
+        job.timings.update(result.get('timings', {}))
+        if result.get('trace'):
+            job.trace.extend(result['trace'])
+        if result.get('error'):
+            job.error = result['error']
+
+    def _run(self, job: Job) -> None:
+        """
+        Send one job and wait for its response.
+        """
+        try:
+            if job.stream:
+                with self.client.stream('POST', '/messages', json=self.request_body(job)) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if line:
+                            self._apply(job, json.loads(line))
+            else:
+                response = self.client.post('/messages', json=self.request_body(job))
+                response.raise_for_status()
+                self._apply(job, response.json())
+        except Exception:
+            job.error = traceback.format_exc()
+        finally:
+            job.done.set()
+
+    def retranslate_conversation(
+        self,
+        conversation_id: str,
+        user_1_language: str,
+        user_2_language: str,
+        script: str,
+        backend: str | None = None
+    ) -> int:
+        """
+        Ask the service to re-translate every stored message of a conversation.
+        :return: The number of messages re-translated.
+        """
+        response = self.client.post(f'/conversations/{quote(conversation_id, safe="")}/retranslate', json={
+            'user_1_language': user_1_language,
+            'user_2_language': user_2_language,
+            'script': script,
+            'backend': backend
+        })
+        response.raise_for_status()
+        return response.json()['messages']
+
+    def load_messages(self, conversation_id: str, before_id: int | None = None, limit: int = 50) -> list[dict]:
+        """
+        Fetch a page of a conversation's stored history from the service.
+        :param conversation_id: A string identifying the conversation.
+        :param before_id: If given, only messages older than this ID are returned.
+        :param limit: The maximum number of messages to return.
+        :return: A list of message dicts, oldest first.
+        """
+        params = {'limit': limit}
+        if before_id is not None:
+            params['before_id'] = before_id
+        response = self.client.get(f'/conversations/{quote(conversation_id, safe="")}/messages', params=params)
+        response.raise_for_status()
+        return response.json()['messages']
+
+    def delete_conversation(self, conversation_id: str) -> None:
+        """
+        Ask the service to delete every stored message of a conversation.
+        :param conversation_id: A string identifying the conversation.
+        """
+        response = self.client.delete(f'/conversations/{quote(conversation_id, safe="")}')
+        response.raise_for_status()
+
+    def forget_prompt(self, conversation_id: str) -> None:
+        """
+        Ask the service to drop a conversation's ASR prompt, e.g. after the conversation has been cleared.
+        :param conversation_id: A string identifying the conversation.
+        """
+        response = self.client.delete(f'/conversations/{quote(conversation_id, safe="")}/prompt')
+        response.raise_for_status()
+
+    def stats(self) -> dict:
+        """
+        Fetch the service's statistics.
+        :return: The service's statistics as a dict.
+        """
+        response = self.client.get('/stats')
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,155 @@
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, pcm16_to_float32
+from vad import trim_silence
+
+
+def join_segments(segments: list[str]) -> str:
+    """
+    Join transcribed segments, inserting a space only where two English words would otherwise run together.
+    :param segments: A list of transcribed text segments.
+    :return: The joined transcript.
+    """
+    joined = ''
+    for segment in segments:
+        if not segment:
+            continue
+        if joined and joined[-1].isascii() and joined[-1].isalnum() and segment[0].isascii() and segment[0].isalnum():
+            joined += ' '
+        joined += segment
+    return joined
+
+
+class StreamingTranscriber:
+    """
+    Incremental Whisper transcription over a rolling audio buffer.
+
+    Frames are fed in as they are captured. A background thread decodes the pending audio every `step_seconds` to
+    produce a partial transcript, and once the pending audio reaches `window_seconds` it is decoded one last time and
+    committed. When recording stops only the uncommitted tail still has to be decoded.
+    """
+
+    def __init__(
+        self,
+        model,
+        initial_prompt: str = '',
+        window_seconds: float = 5.0,
+        step_seconds: float = 1.0,
+        decode_options: dict | None = None,
+        lock=None
+    ):
+        """
+        :param model: A loaded Whisper model.
+        :param initial_prompt: A string used to prompt Whisper before the first window.
+        :param window_seconds: The length of audio in seconds after which the pending buffer is committed.
+        :param step_seconds: The amount of new audio in seconds that triggers a new partial decode.
+        :param decode_options: Extra keyword arguments of each `transcribe` call, e.g. from transcribe_options.
+        :param lock: A context manager held around each `transcribe` call, e.g. engine.model_lock, so that decodes do
+                     not run on the model at the same time as the pipeline's ASR workers.
+        """
+        self.model = model
+        self.initial_prompt = initial_prompt
+        self.decode_options = {'fp16': model.device.type == 'cuda', **(decode_options or {})}
+        self.model_lock = lock or nullcontext()
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.step_samples = int(step_seconds * SAMPLE_RATE)
+
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._committed = []
+        self._partial = ''
+        self._decoded_samples = 0
+
+        self._lock = threading.Lock()
+        self._new_audio = threading.Event()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _decode(self, audio: np.ndarray) -> str:
+        """
+        Decode a single window of audio with its silences trimmed.
+        :param audio: A float32 waveform sampled at 16 kHz.
+        :return: The transcribed text.
+        """
+        prompt = self._committed[-1] if self._committed else self.initial_prompt
+        with self.model_lock:
+            result = self.model.transcribe(
+                audio=trim_silence(audio),
+                language='zh',
+                task='transcribe',
+                initial_prompt=prompt,
+                **self.decode_options
+            )
+        return result['text'].strip()
+
+    def _run(self) -> None:
+        """
+        Worker loop that decodes the pending buffer whenever enough new audio has arrived.
+        """
+        while True:
+            self._new_audio.wait()
+            self._new_audio.clear()
+
+            with self._lock:
+                if self._stopped:
+                    return
+                pending = self._pending
+                if len(pending) >= self.window_samples:
+                    window = pending[:self.window_samples]
+                    self._pending = pending[self.window_samples:]
+                    commit = True
+                elif len(pending) - self._decoded_samples >= self.step_samples:
+                    window = pending
+                    commit = False
+                else:
+                    continue
+
+            text = self._decode(window)
+
+            with self._lock:
+                if commit:
+                    self._committed.append(text)
+                    self._partial = ''
+                    self._decoded_samples = 0
+                    if len(self._pending) >= self.step_samples:
+                        self._new_audio.set()
+                else:
+                    self._partial = text
+                    self._decoded_samples = len(window)
+
+    def feed(self, chunk: bytes) -> None:
+        """
+        Append a captured chunk of 16-bit PCM audio to the rolling buffer. Never blocks on decoding.
+        :param chunk: Raw int16 audio bytes.
+        """
+        with self._lock:
+            self._pending = np.concatenate([self._pending, pcm16_to_float32(chunk)])
+        self._new_audio.set()
+
+    @property
+    def text(self) -> str:
+        """
+        The best transcript so far: all committed windows followed by the latest partial.
+        """
+        with self._lock:
+            return join_segments(self._committed + [self._partial])
+
+    def finish(self) -> str:
+        """
+        Stop the background worker and decode whatever audio has not been committed yet.
+        :return: The final transcript.
+        """
+        with self._lock:
+            self._stopped = True
+        self._new_audio.set()
+        self._worker.join()
+
+        if len(self._pending) > 0:
+            self._committed.append(self._decode(self._pending))
+            self._pending = np.zeros(0, dtype=np.float32)
+
+        self._partial = ''
+        return join_segments(self._committed)
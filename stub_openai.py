@@ -0,0 +1,127 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers chat completions requests with a canned translation after a fixed delay, streamed or not, including packed
+    batches with structured JSON output.
+    """
+    protocol_version = 'HTTP/1.1'
+    latency = 0.2
+    stream_chunks = 8
+
+    def do_POST(self) -> None:
+        """
+        Handle POST /v1/chat/completions.
+        """
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        text = request['messages'][-1]['content']
+        if request.get('response_format', {}).get('type') in ('json_schema', 'json_object'):
+            # a packed batch: answer every message in the structured format
+            translations = [
+                {'id': message['id'], 'translation': f"[{request['model']}] {message['text']}"}
+                for message in json.loads(text)['messages']
+            ]
+            content = json.dumps({'translations': translations}, ensure_ascii=False)
+        else:
+            content = f"[{request['model']}] {text.split(': ', 1)[-1]}"
+        base = {'id': 'chatcmpl-stub', 'created': int(time.time()), 'model': request['model']}
+
+        time.sleep(self.latency)
+
+        if not request.get('stream'):
+            body = json.dumps({
+                **base,
+                'object': 'chat.completion',
+                'choices': [
+                    {'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}
+                ],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        size = max(1, -(-len(content) // self.stream_chunks))
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        events = [
+            {**base, 'object': 'chat.completion.chunk',
+             'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+            for piece in pieces
+        ]
+        events.append({**base, 'object': 'chat.completion.chunk',
+                       'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+
+        for event in events:
+            self._write_chunk(f'data: {json.dumps(event)}\n\n'.encode('utf-8'))
+        self._write_chunk(b'data: [DONE]\n\n')
+        self._write_chunk(b'')
+
+    def _write_chunk(self, data: bytes) -> None:
+        """
+        Write one chunk of a chunked response. An empty chunk ends the response.
+        """
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, format: str, *args) -> None:
+        """
+        Keep request logs out of benchmark output.
+        """
+
+
+def start_stub_server(latency: float = 0.2, port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+    """
+    Start a stub OpenAI chat completions server on a background thread.
+    :param latency: The delay in seconds before each response.
+    :param port: The port to listen on. Defaults to any free port.
+    :return: A tuple containing the server and its base URL, suitable for OPENAI_BASE_URL.
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {'latency': latency})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-openai', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='stub_openai.py',
+        description='Serves a stub OpenAI chat completions endpoint for offline testing and benchmarks.'
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=8765,
+        help='An integer representing the port to listen on.'
+    )
+    parser.add_argument(
+        '-l', '--latency',
+        type=float,
+        default=0.2,
+        help='A float representing the delay in seconds before each response.'
+    )
+    args = parser.parse_args()
+
+    stub, url = start_stub_server(args.latency, args.port)
+    print(f'Stub OpenAI endpoint at {url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.shutdown()
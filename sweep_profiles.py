@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import time
+
+import whisper
+
+from asr import numeric_sort
+from asr_backends import ASR_BACKENDS, DECODE_PROFILES
+from batch_asr import PROMPT
+from engine import asr_model, transcribe_audio
+from evaluate_whisper import get_results
+
+
+def sweep_profile(
+    profile: str,
+    paths: list[str],
+    gold_txt: str,
+    output_dir: str,
+    asr_backend: str
+) -> dict:
+    """
+    Transcribe a corpus with one decoding profile and score the transcriptions against the gold transcriptions.
+    Each file goes through the same `transcribe` call as a message in the app, with the profile's temperature fallback
+    and conditioning on previous text, so latency and accuracy are what users get.
+    :param profile: A key of DECODE_PROFILES.
+    :param paths: A list of audio file paths, in the same order as the gold transcriptions.
+    :param gold_txt: A .txt file containing one gold transcription per line.
+    :param output_dir: The directory in which the predicted transcriptions and evaluation results are written.
+    :param asr_backend: A key of ASR_BACKENDS.
+    :return: A dict containing the model load time, transcription latency, and the CER/WER summary.
+    """
+    model_size = DECODE_PROFILES[profile]['model_size']
+
+    # loading is timed separately so that it does not count towards per-file latency
+    start = time.perf_counter()
+    asr_model(asr_backend, profile)
+    load_seconds = time.perf_counter() - start
+
+    predicted_txt = os.path.join(output_dir, f'predicted_prompted_{asr_backend}_{profile}.txt')
+    start = time.perf_counter()
+    with open(predicted_txt, 'w', newline='', encoding='utf-8') as f:
+        for path in paths:
+            transcription = transcribe_audio(whisper.load_audio(path), PROMPT, asr_backend, profile)
+            f.write(f'{transcription.strip()}\n')
+    elapsed = time.perf_counter() - start
+
+    with open(gold_txt, 'r', encoding='utf-8') as gold_file, open(predicted_txt, 'r', encoding='utf-8') as predicted:
+        summary = get_results(
+            (line.strip() for line in gold_file),
+            (line.strip() for line in predicted),
+            os.path.join(output_dir, f'evaluation_{asr_backend}_{profile}.txt')
+        )
+
+    return {
+        'profile': profile,
+        'model_size': model_size,
+        'load_s': load_seconds,
+        'total_s': elapsed,
+        'per_file_s': elapsed / len(paths) if paths else 0.0,
+        **summary
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        prog='sweep_profiles.py',
+        description='Reports the latency and CER/WER of each Whisper decoding profile on a transcribed corpus.'
+    )
+    parser.add_argument(
+        'input_dir',
+        type=str,
+        help='A string representing the name of the directory containing the audio files to be transcribed.'
+    )
+    parser.add_argument(
+        'gold_txt',
+        type=str,
+        help='A string representing the name of the .txt file containing gold transcriptions, in file order.'
+    )
+    parser.add_argument(
+        'output_dir',
+        type=str,
+        help='A string representing the name of the directory where transcriptions and results will be written.'
+    )
+    parser.add_argument(
+        '-p', '--profiles',
+        nargs='+',
+        default=list(DECODE_PROFILES),
+        choices=list(DECODE_PROFILES),
+        help='The decoding profiles to compare.'
+    )
+    parser.add_argument(
+        '-a', '--asr-backend',
+        type=str,
+        default='whisper',
+        choices=list(ASR_BACKENDS),
+        help='A string representing the inference backend used to run the Whisper checkpoint.'
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    audio_files = sorted(os.listdir(args.input_dir), key=numeric_sort)
+    audio_paths = [os.path.join(args.input_dir, audio_file) for audio_file in audio_files]
+
+    results = []
+    for name in args.profiles:
+        result = sweep_profile(name, audio_paths, args.gold_txt, args.output_dir, args.asr_backend)
+        results.append(result)
+        print(' '.join(f'{key}={value:.3f}' if isinstance(value, float) else f'{key}={value}'
+                       for key, value in result.items()))
+
+    with open(os.path.join(args.output_dir, f'sweep_{args.asr_backend}.json'), 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
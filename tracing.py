@@ -0,0 +1,269 @@
+import contextvars
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+# upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar('trace', default=None)
+
+
+class Metrics:
+    """
+    Process-wide latency histograms (one per span name) and counters, rendered in the Prometheus text format.
+    """
+
+    def __init__(self, prefix: str = 'translator'):
+        """
+        :param prefix: The prefix of every metric name.
+        """
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(lambda: [0] * len(BUCKETS))
+        self._sums = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._counters = defaultdict(float)
+
+    def observe(self, span: str, seconds: float) -> None:
+        """
+        Record the duration of a span.
+        :param span: The span name, e.g. 'asr' or 'llm_request'.
+        :param seconds: The duration in seconds.
+        """
+        with self._lock:
+            buckets = self._buckets[span]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self._sums[span] += seconds
+            self._counts[span] += 1
+
+    def inc(self, name: str, value: float = 1.0) -> None:
+        """
+        Increase a counter.
+        :param name: The counter name, e.g. 'translation_cache_hits'.
+        :param value: The amount to add.
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def render(self, gauges: dict[str, float] | None = None) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        :param gauges: Optional point-in-time values to include, e.g. queue lengths.
+        :return: The metrics as text.
+        """
+        histogram = f'{self.prefix}_span_seconds'
+        lines = [f'# HELP {histogram} Duration of traced spans.', f'# TYPE {histogram} histogram']
+
+        with self._lock:
+            for span in sorted(self._counts):
+                for bound, count in zip(BUCKETS, self._buckets[span]):
+                    lines.append(f'{histogram}_bucket{{span="{span}",le="{bound}"}} {count}')
+                lines.append(f'{histogram}_bucket{{span="{span}",le="+Inf"}} {self._counts[span]}')
+                lines.append(f'{histogram}_sum{{span="{span}"}} {self._sums[span]}')
+                lines.append(f'{histogram}_count{{span="{span}"}} {self._counts[span]}')
+
+            for name in sorted(self._counters):
+                lines.append(f'# TYPE {self.prefix}_{name}_total counter')
+                lines.append(f'{self.prefix}_{name}_total {self._counters[name]}')
+
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f'# TYPE {self.prefix}_{name} gauge')
+            lines.append(f'{self.prefix}_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+# the most recently finished traces in this process, newest last
+recent = deque(maxlen=100)
+
+_file_lock = threading.Lock()
+
+
+class Trace:
+    """
+    The timed spans and attributes (models, token usage, cache hits) recorded while one message is processed.
+    Span start times are in seconds relative to the creation of the trace.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.spans = []
+        self.attributes = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, duration: float, start: float | None = None, **attributes) -> None:
+        """
+        Record a finished span.
+        :param name: The span name.
+        :param duration: The duration of the span in seconds.
+        :param start: The perf_counter value at which the span started. Defaults to `duration` seconds ago.
+        :param attributes: Extra attributes of the span.
+        """
+        start = time.perf_counter() - duration if start is None else start
+        span = {'name': name, 'start': round(start - self.started_at, 6), 'duration': round(duration, 6), **attributes}
+        with self._lock:
+            self.spans.append(span)
+        metrics.observe(name, duration)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """
+        Time a block of code as a span.
+        :param name: The span name.
+        :param attributes: Attributes of the span.
+        :return: A context manager yielding the span's attributes, which the block may add to.
+        """
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.add(name, time.perf_counter() - start, start, **attributes)
+
+    def annotate(self, **attributes) -> None:
+        """
+        Set attributes of the whole trace.
+        """
+        with self._lock:
+            self.attributes.update(attributes)
+
+    def extend(self, data: dict) -> None:
+        """
+        Merge in a trace recorded elsewhere, e.g. by the translation service.
+        :param data: A dict produced by `to_dict`.
+        """
+        with self._lock:
+            self.spans.extend(data.get('spans', []))
+            self.attributes.update(data.get('attributes', {}))
+
+    def to_dict(self) -> dict:
+        """
+        :return: A JSON-serializable dict containing the spans and attributes.
+        """
+        with self._lock:
+            return {'spans': list(self.spans), 'attributes': dict(self.attributes)}
+
+    def to_json(self) -> str:
+        """
+        :return: The trace as a JSON string.
+        """
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+
+@contextmanager
+def activate(trace: Trace) -> Iterator[Trace]:
+    """
+    Make a trace the target of `span` and `annotate` calls in the current thread.
+    :param trace: The trace of the message being processed.
+    :return: A context manager yielding the trace.
+    """
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """
+    Time a block of code as a span of the active trace. Without an active trace only the latency metric is recorded.
+    :param name: The span name.
+    :param attributes: Attributes of the span.
+    :return: A context manager yielding the span's attributes, which the block may add to.
+    """
+    trace = _current.get()
+    if trace is not None:
+        with trace.span(name, **attributes) as span_attributes:
+            yield span_attributes
+        return
+
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        metrics.observe(name, time.perf_counter() - start)
+
+
+def annotate(**attributes) -> None:
+    """
+    Set attributes of the active trace, if there is one.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.annotate(**attributes)
+
+
+def count(name: str, value: float = 1.0) -> None:
+    """
+    Increase a process-wide counter.
+    :param name: The counter name.
+    :param value: The amount to add.
+    """
+    metrics.inc(name, value)
+
+
+def finish(trace: Trace, **attributes) -> None:
+    """
+    Record a finished trace in the recent traces and, if TRACE_FILE is set, append it to that JSONL file.
+    :param trace: The finished trace.
+    :param attributes: Extra fields stored with it, e.g. the user and the message ID.
+    """
+    record = {**trace.to_dict(), **attributes, 'finished_at': time.time()}
+    recent.append(record)
+
+    trace_file = os.getenv('TRACE_FILE')
+    if trace_file:
+        with _file_lock, open(trace_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def profiled(function: Callable, *args, label: str = 'profile'):
+    """
+    Run a function under cProfile and write the stats to PROFILE_DIR (default 'profiles').
+    :param function: The function to run.
+    :param args: Its arguments.
+    :param label: A label included in the file name, e.g. the pipeline stage.
+    :return: The function's return value.
+    """
+    profile_dir = os.getenv('PROFILE_DIR', 'profiles')
+    os.makedirs(profile_dir, exist_ok=True)
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args)
+    finally:
+        profiler.dump_stats(os.path.join(profile_dir, f'{time.time_ns()}-{label}.prof'))
+
+
+def start_file_exporter(path: str, interval: float = 15.0) -> threading.Thread:
+    """
+    Periodically write the metrics to a file in the Prometheus text format, e.g. for node_exporter's textfile collector.
+    :param path: The file to write.
+    :param interval: The number of seconds between writes.
+    :return: The exporter thread.
+    """
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            # write then rename, so the collector never reads a partial file
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                f.write(metrics.render())
+            os.replace(f'{path}.tmp', path)
+
+    thread = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+    thread.start()
+    return thread
+
+
+if os.getenv('METRICS_FILE'):
+    start_file_exporter(os.environ['METRICS_FILE'])
@@ -1,44 +1,37 @@
 import streamlit as st
-import whisper
-import torch
 import os
-import wave
-import pyaudio
-import tempfile
-from openai import OpenAI
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import sessionmaker, declarative_base
-
-torch.classes.__path__ = []
-
-Base = declarative_base()
-
-# audio recording params
-FORMAT = pyaudio.paInt16
+import threading
+import time
+import numpy as np
+from typing import Callable
+from asr_backends import ASR_BACKENDS, DECODE_PROFILES, decode_profile, transcribe_options
+from audio_utils import pcm16_to_float32, wav_bytes_to_float32
+from pipeline import DEFAULT_CONVERSATION, Job, Pipeline, message_languages
+from script_convert import SIMPLIFIED, TRADITIONAL, convert
+from service_client import ServiceClient
+from streaming_asr import StreamingTranscriber
+from translation_backend import BACKENDS
+from vad import EndpointDetector
+
+# audio recording params (16-bit PCM)
 CHANNELS = 1
 RATE = 16000
 CHUNK = 1024
 
+# number of history messages loaded at startup and per "load earlier" click
+HISTORY_PAGE_SIZE = 50
 
-class Message(Base):
-    __tablename__ = 'messages'
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user = Column(String)
-    raw_text = Column(String)
-    translated_text = Column(String)
-    source_language = Column(String)
-    target_language = Column(String)
-
+# if set, ASR and translation run in the translation service (service.py) instead of in this process
+SERVICE_URL = os.getenv('TRANSLATION_SERVICE_URL')
 
-db = "sqlite:///./database.db"
-engine = create_engine(db)
-Base.metadata.create_all(bind=engine)
-Session = sessionmaker(bind=engine)
-session = Session()
+# a thin client leaves the database, models and pipeline to the service, so it never creates a database or starts the
+# write-behind thread
+if SERVICE_URL is None:
+    from database import Message, Session, delete_conversation, init_db, load_messages
+    from engine import asr_model, asr_prompt, create_pipeline, forget_prompt, model_lock, retranslate_conversation
 
-device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    init_db()
 
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY_TRANSLATE"))
 
 script_map = {
     'Simplified 简体字':
@@ -46,32 +39,113 @@ script_map = {
             'title': '粤语英文翻译机',
             'lang': '语言',
             'cantonese': '粤语',
-            'prompt': '我啱啱食完lunch，好饱啊。你今晚有冇兴趣去party？We can go together.',
             'start': '开始',
             'record': '录音',
             'translate': '翻译',
             'audio': '音频',
-            'enter': '输入'
+            'enter': '输入',
+            'load': '加载',
+            'convert': SIMPLIFIED
         },
     'Traditional 繁體字':
         {
             'title': '粵語英文翻譯機',
             'lang': '語言',
             'cantonese': '粵語',
-            'prompt': '我啱啱食完lunch，好飽啊。你今晚有冇興趣去party？We can go together.',
             'start': '開始',
             'record': '錄音',
             'translate': '翻譯',
             'audio': '音頻',
-            'enter': '輸入'
+            'enter': '輸入',
+            'load': '載入',
+            'convert': TRADITIONAL
         }
 }
 
+
+def message_dict(row: 'Message') -> dict:
+    """
+    Convert a stored message into the dict kept in the session state.
+    :param row: A Message row.
+    :return: A dict containing the message ID, user, raw text and translated text.
+    """
+    return {'id': row.id, 'user': row.user, 'raw_text': row.raw_text, 'translated_text': row.translated_text}
+
+
+def latency_breakdown(messages: list[dict]) -> list[dict]:
+    """
+    Summarize the traces of messages as one row of span durations per message.
+    :param messages: Message dicts from the session state. Messages without a trace are skipped.
+    :return: A list of dicts mapping each span name to its total duration in milliseconds, plus trace attributes.
+    """
+    rows = []
+    for msg in messages:
+        if not msg.get('trace'):
+            continue
+        row = {'message': msg['raw_text'][:20]}
+        for span in msg['trace']['spans']:
+            row[span['name']] = row.get(span['name'], 0) + round(span['duration'] * 1000)
+        row.update(msg['trace']['attributes'])
+        rows.append(row)
+    return rows
+
+
+def arm_profiler() -> None:
+    """
+    Profile the pipeline stages of the next message this session sends.
+    """
+    st.session_state['profile_next'] = True
+
+
+@st.cache_resource
+def get_pipeline() -> Pipeline | ServiceClient:
+    """
+    Create the process-wide message pipeline shared by every session, or a client for the translation service.
+    :return: A pipeline with ASR, translation and persistence stages, or a client with the same `submit` method.
+    """
+    if SERVICE_URL:
+        return ServiceClient(SERVICE_URL)
+    return create_pipeline()
+
+
+def history_page(before_id: int | None = None) -> list[dict]:
+    """
+    Load a page of this conversation's history, from the translation service if one is configured.
+    :param before_id: If given, only messages older than this ID are returned.
+    :return: A list of up to HISTORY_PAGE_SIZE message dicts, oldest first.
+    """
+    if SERVICE_URL:
+        return get_pipeline().load_messages(conversation_id, before_id=before_id, limit=HISTORY_PAGE_SIZE)
+    with Session() as db_session:
+        rows = load_messages(db_session, conversation_id, before_id=before_id, limit=HISTORY_PAGE_SIZE)
+    return [message_dict(row) for row in rows]
+
+
+def load_earlier() -> None:
+    """
+    Prepend the previous page of conversation history to the messages shown in this session.
+    """
+    messages = history_page(before_id=st.session_state['messages'][0]['id'])
+    st.session_state['messages'][:0] = messages
+    st.session_state['has_earlier'] = len(messages) == HISTORY_PAGE_SIZE
+
+
+# each conversation is addressed by the ?conversation= query parameter
+conversation_id = st.query_params.get('conversation', DEFAULT_CONVERSATION)
+
+if st.session_state.get('conversation_id') != conversation_id:
+    st.session_state['conversation_id'] = conversation_id
+    st.session_state.pop('messages', None)
+
 if 'messages' not in st.session_state:
-    rows = session.query(Message).all()
-    st.session_state['messages'] = [
-        {'user': row.user, 'raw_text': row.raw_text, 'translated_text': row.translated_text} for row in rows
-    ]
+    st.session_state['messages'] = history_page()
+    st.session_state['has_earlier'] = len(st.session_state['messages']) == HISTORY_PAGE_SIZE
+
+if 'pending' not in st.session_state:
+    st.session_state['pending'] = []
+
+if 'failed' not in st.session_state:
+    st.session_state['failed'] = []
 
 st.set_page_config(page_title="Cantonese-English Translator", page_icon='🌐')
 
@@ -91,20 +165,106 @@ with st.sidebar:
         index=1
     )
 
+    # live transcription needs the ASR model in this process, so it is unavailable when using the service
+    streaming = st.toggle(
+        'Live transcription 实时转录 / 實時轉錄',
+        value=SERVICE_URL is None,
+        disabled=SERVICE_URL is not None,
+        help='Transcribe speech while recording and show partial transcripts in the chat.'
+    )
+
+    stream_translation = st.toggle(
+        'Live translation 实时翻译 / 實時翻譯',
+        value=True,
+        help='Show the translation in the chat as it is generated.'
+    )
+
+    asr_backend_options = list(ASR_BACKENDS)
+    asr_backend = st.selectbox(
+        label=f"Speech recognition engine | {script_map[script]['record']}引擎",
+        options=asr_backend_options,
+        index=asr_backend_options.index(os.getenv('ASR_BACKEND', 'whisper')),
+        format_func=lambda key: ASR_BACKENDS[key]
+    )
+
+    asr_profile_options = list(DECODE_PROFILES)
+    asr_profile = st.selectbox(
+        label=f"Speech recognition mode | {script_map[script]['record']}模式",
+        options=asr_profile_options,
+        index=asr_profile_options.index(os.getenv('ASR_PROFILE', 'balanced')),
+        format_func=lambda key: DECODE_PROFILES[key]['label'],
+        help='Realtime uses the small model with greedy decoding; Accurate uses beam search.'
+    )
+
+    backend_options = list(BACKENDS)
+    translation_backend = st.selectbox(
+        label=f"Translation engine | {script_map[script]['translate']}引擎",
+        options=backend_options,
+        index=backend_options.index(os.getenv('TRANSLATION_BACKEND', 'openai')),
+        format_func=lambda key: BACKENDS[key]
+    )
+
+    if st.toggle('Debug 调试 / 調試', value=os.getenv('DEBUG_PANEL', '0') == '1',
+                 help='Show latency breakdowns (ms) of recent messages.'):
+        st.dataframe(latency_breakdown(st.session_state['messages'][-10:]), hide_index=True)
+        if st.session_state.get('profile_next'):
+            st.caption('The next message will be profiled.')
+        else:
+            st.button('Profile next message', on_click=arm_profiler,
+                      help='Write cProfile stats for each pipeline stage of the next message to PROFILE_DIR.')
+
 st.title(f'🌐 Cantonese-English Translator | {script_map[script]["title"]}', anchor='translator')
 
 
-def record_audio(filename: str = 'output.wav', record_seconds: int = 10) -> str:
+def bubble_html(user: str, raw_text: str, translated_text: str) -> str:
     """
-    Record audio using PyAudio.
-    :param filename: A string corresponding to the name of the output audio file.
-    :param record_seconds: An integer corresponding to the duration of the recording in seconds.
-    :return: The name of the audio file.
+    Build the HTML for a single chat bubble. Chinese text is shown in the selected script, converted locally, so
+    switching scripts re-renders the whole conversation without re-transcribing or re-translating anything.
+    :param user: A string corresponding to the user who sent the message: 'User 1' or 'User 2'.
+    :param raw_text: The original message text.
+    :param translated_text: The translated message text.
+    :return: A string of HTML to be rendered with st.markdown.
     """
+    align = 'left' if user == "User 1" else 'right'
+    bubble_color = '#0492d4' if user == 'User 1' else '#09bd0f'
+    raw_text = convert(raw_text, script_map[script]['convert'])
+    translated_text = convert(translated_text, script_map[script]['convert'])
+
+    return f"""
+            <div style='text-align: {align}; margin-bottom: 1rem;'>
+                <div style='display: inline-block; background-color: {bubble_color}; padding: 10px 15px;
+                border-radius: 15px; max-width: 80%; text-align: left;'>
+                    {raw_text}<br><br>
+                    <em>{translated_text}</em>
+                </div>
+            </div>
+            """
+
+
+def live_renderer(user: str) -> Callable[[str, str], None]:
+    """
+    Create a callback that renders an in-progress message into the live chat bubble.
+    :param user: A string corresponding to the user who sent the message: 'User 1' or 'User 2'.
+    :return: A function taking the raw text and the translation so far.
+    """
+    def render(raw_text: str, translated_text: str) -> None:
+        live_bubble.markdown(bubble_html(user, raw_text, translated_text), unsafe_allow_html=True)
+
+    return render
+
+
+def record_audio(record_seconds: int = 10) -> np.ndarray:
+    """
+    Record audio using PyAudio, stopping early once the speaker has finished talking.
+    :param record_seconds: An integer corresponding to the maximum duration of the recording in seconds.
+    :return: The recording as a float32 waveform, ready to be passed to Whisper.
+    """
+    import pyaudio
+
     audio = pyaudio.PyAudio()
 
     stream = audio.open(
-        format=FORMAT,
+        format=pyaudio.paInt16,
         channels=CHANNELS,
         rate=RATE,
         input=True,
@@ -112,6 +272,7 @@ def record_audio(filename: str = 'output.wav', record_seconds: int = 10) -> str:
     )
 
     frames = []
+    endpoint = EndpointDetector()
 
     timer_placeholder = st.empty()
 
@@ -122,108 +283,188 @@ def record_audio(filename: str = 'output.wav', record_seconds: int = 10) -> str:
         elapsed = i / (RATE / CHUNK)
         timer_placeholder.markdown(f'{elapsed:.1f}s / {record_seconds:.1f}s')
 
+        if endpoint.feed(data):
+            break
+
+    stream.stop_stream()
+    stream.close()
+    audio.terminate()
+
+    timer_placeholder.empty()
+
+    return pcm16_to_float32(b''.join(frames))
+
+
+def record_audio_streaming(user: str, record_seconds: int = 10) -> tuple[str, np.ndarray]:
+    """
+    Record audio using PyAudio while Whisper transcribes it incrementally, showing the partial transcript in the chat.
+    :param user: A string corresponding to the user who is speaking: 'User 1' or 'User 2'.
+    :param record_seconds: An integer corresponding to the maximum duration of the recording in seconds.
+    :return: The final transcript, and the recording as a float32 waveform sampled at 16 kHz for archiving.
+    """
+    model = asr_model(asr_backend, asr_profile)
+    transcriber = StreamingTranscriber(
+        model,
+        initial_prompt=asr_prompt(conversation_id, script).text,
+        decode_options=transcribe_options(decode_profile(asr_profile), model),
+        lock=model_lock(model)
+    )
+    render = live_renderer(user)
+
+    import pyaudio
+
+    audio = pyaudio.PyAudio()
+
+    stream = audio.open(
+        format=pyaudio.paInt16,
+        channels=CHANNELS,
+        rate=RATE,
+        input=True,
+        frames_per_buffer=CHUNK
+    )
+
+    endpoint = EndpointDetector()
+
+    timer_placeholder = st.empty()
+
+    frames = []
+    for i in range(0, int(RATE / CHUNK * record_seconds)):
+        data = stream.read(CHUNK, exception_on_overflow=False)
+        frames.append(data)
+        transcriber.feed(data)
+
+        elapsed = i / (RATE / CHUNK)
+        timer_placeholder.markdown(f'{elapsed:.1f}s / {record_seconds:.1f}s')
+        render(transcriber.text, '...')
+
+        if endpoint.feed(data):
+            break
+
     stream.stop_stream()
     stream.close()
     audio.terminate()
 
     timer_placeholder.empty()
 
-    wf = wave.open(filename, 'wb')
-    wf.setnchannels(CHANNELS)
-    wf.setsampwidth(audio.get_sample_size(FORMAT))
-    wf.setframerate(RATE)
-    wf.writeframes(b''.join(frames))
-    wf.close()
+    raw_text = transcriber.finish()
+    render(raw_text, '...')
 
-    return filename
+    return raw_text, pcm16_to_float32(b''.join(frames))
 
 
-def transcribe_and_translate(input_str: str, source_language: str, target_language: str, mode: str) -> tuple[str, str]:
+def submit_message(
+    user: str,
+    payload: str | np.ndarray,
+    mode: str,
+    timings: dict | None = None,
+    audio: np.ndarray | None = None
+) -> None:
     """
-    Transcribe the provided audio file using Whisper and translate the corresponding transcription from the
-    source language to the target language using GPT-4o-mini.
-    :param input_str: If transcribing, a string corresponding to the name of the input audio file.
-    If translating, the input string.
-    :param source_language: A string corresponding to the source language from which the text is to be translated.
-    :param target_language: A string corresponding to the target language into which the text is to be translated.
+    Hand a captured message to the background pipeline and track it as pending for this session.
+    :param user: A string corresponding to the user who sent the message: 'User 1' or 'User 2'.
+    :param payload: If transcribing, a float32 waveform sampled at 16 kHz. If translating, the input string.
     :param mode: A string corresponding to the mode in which the input should be handled: 'transcribe' or 'translate'.
-    :return: A tuple containing the raw text output from Whisper and the translated text output from GPT-4o-mini.
+    :param timings: A dict of timings already measured on the script thread, e.g. for capture.
+    :param audio: The recording behind a message transcribed while it was captured, archived with the message.
     """
-    if mode == 'transcribe':
-        asr_model = whisper.load_model('medium').to(device)
-
-        transcription = asr_model.transcribe(
-            audio=input_str,
-            language='zh',
-            task='transcribe',
-            initial_prompt=script_map[script]['prompt']
-        )
-
-        raw_text = transcription['text']
-
-        del asr_model
-        torch.cuda.empty_cache()
-
-    else:
-        raw_text = input_str
-
-    system_prompt = {
-        "role": "system",
-        "content": f"You are a bilingual conversation translator. User 1 prefers {user_1_language}, and User 2 prefers "
-                   f"{user_2_language}. When a user sends a message in either Cantonese, English, or a mix of both, "
-                   f"translate it fully into the language the other user prefers. Maintain meaning, structure, and "
-                   f"punctuation as closely as possible. Do not use em dashes or semicolons if the original text only "
-                   f"uses commas. Do not assume the message is always in one language, detect it dynamically.\n\n "
-                   f"**IMPORTANT: If translating into Cantonese, you must use written Cantonese with colloquial "
-                   f"vocabulary.** It is extremely important that you do not use Mandarin or Standard Chinese. Use "
-                   f"words and sentence structures common in Hong Kong written Cantonese. For example:\n "
-                   f"- Use '咗' for past tense instead of other forms.\n "
-                   f"- Use '佢哋' for 'they' instead of '他们'.\n "
-                   f"- Use '冇' for negation instead of '没有'.\n "
-                   f"- Use '喺' for prepositions like 'at'/'in'/'on' instead of '在'.\n"
-                   f"Remember, you must ensure that text containing exclusively English or a mix of both English and "
-                   f"Cantonese must be translated fully into Cantonese using written Cantonese, not Mandarin or "
-                   f"Standard Chinese. Use colloquial vocabulary and sentence structures common in Hong Kong written "
-                   f"Cantonese. If the original text already contains Chinese characters, please try to only change "
-                   f"the English text and maintain the original Cantonese text in terms of wording and structure, even "
-                   f"if it is not colloquial Cantonese but rather is Standard Chinese. "
-                   f"**However, there must be no English text left in the output!**"
-    }
-
-    user_prompt = {
-        "role": "user",
-        "content": f"Translate the following message from {source_language} to {target_language}: {raw_text}"
-    }
-
-    response = openai_client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[system_prompt, user_prompt]
+    source_language, target_language = message_languages(user, user_1_language, user_2_language)
+
+    job = Job(
+        user=user,
+        payload=payload,
+        mode=mode,
+        source_language=source_language,
+        target_language=target_language,
+        user_1_language=user_1_language,
+        user_2_language=user_2_language,
+        script=script,
+        conversation_id=conversation_id,
+        stream=stream_translation,
+        backend=translation_backend,
+        asr_backend=asr_backend,
+        asr_profile=asr_profile,
+        audio=audio
     )
+    job.timings.update(timings or {})
+    if timings and 'capture' in timings:
+        job.trace.add('capture', timings['capture'], job.trace.started_at - timings['capture'])
+    job.profile = st.session_state.pop('profile_next', False)
 
-    translated_text = response.choices[0].message.content.strip()
+    st.session_state['pending'].append(get_pipeline().submit(job))
 
-    return raw_text, translated_text
+
+def is_saved(job: Job) -> bool:
+    """
+    Check whether a job has finished and, when persisted locally, has been committed so that its message ID is known.
+    :param job: A job submitted from this session.
+    :return: True once the job can be moved into the conversation.
+    """
+    if not job.done.is_set():
+        return False
+    # jobs run by the service, or that failed before the persistence stage, carry no future
+    if job.persisted is None:
+        return True
+    if not job.persisted.done():
+        return False
+    if job.persisted.exception() is None:
+        job.message_id = job.persisted.result()
+    elif job.error is None:
+        job.error = repr(job.persisted.exception())
+    return True
+
+
+@st.fragment(run_every=0.5 if st.session_state['pending'] else None)
+def pending_messages() -> None:
+    """
+    Render messages that are still in the pipeline and move finished ones into the conversation in submission order.
+    """
+    pending = st.session_state['pending']
+
+    finished = False
+    # write-behind persistence assigns IDs shortly after a job is done, and history paging relies on them
+    while pending and is_saved(pending[0]):
+        job = pending.pop(0)
+        if job.error is None:
+            st.session_state['messages'].append({
+                'id': job.message_id,
+                'user': job.user,
+                'raw_text': job.raw_text,
+                'translated_text': job.translated_text,
+                'timings': job.timings,
+                'trace': job.trace.to_dict()
+            })
+        else:
+            # shown by the full rerun below, which replaces this fragment's elements
+            st.session_state['failed'].append(f'{job.user} message failed | 信息失敗: {job.error.strip().splitlines()[-1]}')
+        finished = True
+
+    if finished:
+        st.rerun()
+
+    for job in pending:
+        st.markdown(bubble_html(job.user, job.raw_text or '...', job.translated_text or '...'), unsafe_allow_html=True)
 
 
 st.markdown('---')
 
 with st.container(height=400):
-    for msg in (st.session_state['messages']):
-        align = 'left' if msg['user'] == "User 1" else 'right'
-        bubble_color = '#0492d4' if msg['user'] == 'User 1' else '#09bd0f'
+    if st.session_state['has_earlier']:
+        st.button(f"Load earlier {script_map[script]['load']}更早信息", key='load-earlier', on_click=load_earlier)
+
+    # one markdown element for the whole history instead of one per bubble
+    history = st.session_state['messages']
+    st.markdown(
+        ''.join(bubble_html(msg['user'], msg['raw_text'], msg['translated_text']) for msg in history),
+        unsafe_allow_html=True
+    )
 
-        st.markdown(
-            f"""
-            <div style='text-align: {align}; margin-bottom: 1rem;'>
-                <div style='display: inline-block; background-color: {bubble_color}; padding: 10px 15px;
-                border-radius: 15px; max-width: 80%; text-align: left;'>
-                    {msg['raw_text']}<br><br>
-                    <em>{msg['translated_text']}</em>
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+    for error in st.session_state['failed']:
+        st.error(error)
+    st.session_state['failed'] = []
+
+    pending_messages()
+
+    live_bubble = st.empty()
 
 st.markdown('---')
 st.subheader('New Message 新信息', anchor='new-message')
@@ -243,42 +484,26 @@ with tab1:
         st.markdown('#### User 1 | 用戶1')
         st.markdown(f'{user_1_language}')
         if st.button(label='🎙️', key='record1', help=f'Start recording | {start_rec}', use_container_width=True):
+            start = time.perf_counter()
             with st.spinner(f'Recording... 正在{script_map[script]["record"]}...'):
-                wav_path = record_audio()
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(wav_path, user_1_language, user_2_language, 'transcribe')
-            message = {'user': 'User 1', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 1',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_1_language,
-                target_language=user_2_language
-            ))
-            session.commit()
-            os.remove(wav_path)
+                if streaming:
+                    (speech, recording), mode = record_audio_streaming('User 1'), 'translate'
+                else:
+                    speech, recording, mode = record_audio(), None, 'transcribe'
+            submit_message('User 1', speech, mode, {'capture': time.perf_counter() - start}, recording)
             st.rerun()
 
     with right_col:
         st.markdown('#### User 2 | 用戶2')
         st.markdown(f'{user_2_language}')
         if st.button('🎙️', key='record2', help=f'Start recording | {start_rec}', use_container_width=True):
+            start = time.perf_counter()
             with st.spinner(f'Recording... 正在{script_map[script]["record"]}...'):
-                wav_path = record_audio()
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(wav_path, user_2_language, user_1_language, 'transcribe')
-            message = {'user': 'User 2', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 2',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_2_language,
-                target_language=user_1_language
-            ))
-            session.commit()
-            os.remove(wav_path)
+                if streaming:
+                    (speech, recording), mode = record_audio_streaming('User 2'), 'translate'
+                else:
+                    speech, recording, mode = record_audio(), None, 'transcribe'
+            submit_message('User 2', speech, mode, {'capture': time.perf_counter() - start}, recording)
             st.rerun()
 
 with tab2:
@@ -291,22 +516,9 @@ with tab2:
         st.markdown(f'{user_1_language}')
         audio_file_1 = st.file_uploader(f'User 1 Audio | 用戶1的{audio}', type=['.wav'], key='uploader1')
         if st.button(label=f'Translate {script_map[script]["translate"]}', key='translate1-file') and audio_file_1:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-                tmp.write(audio_file_1.read())
-                tmp_path = tmp.name
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(tmp_path, user_1_language, user_2_language, 'transcribe')
-            message = {'user': 'User 1', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 1',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_1_language,
-                target_language=user_2_language
-            ))
-            session.commit()
-            os.remove(tmp_path)
+            start = time.perf_counter()
+            waveform = wav_bytes_to_float32(audio_file_1.getvalue())
+            submit_message('User 1', waveform, 'transcribe', {'capture': time.perf_counter() - start})
             st.rerun()
 
     with right_col:
@@ -314,22 +526,9 @@ with tab2:
         st.markdown(f'{user_2_language}')
         audio_file_2 = st.file_uploader(f'User 2 Audio | 用戶2的{audio}', type=['.wav'], key='uploader2')
         if st.button(label=f'Translate {script_map[script]["translate"]}', key='translate2-file') and audio_file_2:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as tmp:
-                tmp.write(audio_file_2.read())
-                tmp_path = tmp.name
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(tmp_path, user_2_language, user_1_language, 'transcribe')
-            message = {'user': 'User 2', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 2',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_2_language,
-                target_language=user_1_language
-            ))
-            session.commit()
-            os.remove(tmp_path)
+            start = time.perf_counter()
+            waveform = wav_bytes_to_float32(audio_file_2.getvalue())
+            submit_message('User 2', waveform, 'transcribe', {'capture': time.perf_counter() - start})
             st.rerun()
 
 with tab3:
@@ -342,18 +541,7 @@ with tab3:
         st.markdown(f'{user_1_language}')
         text1 = st.text_input('User 1 text', placeholder=f'Enter text {enter_text}', label_visibility='collapsed')
         if st.button(label=f'Translate {script_map[script]["translate"]}', key='translate1-text') and text1:
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(text1, user_1_language, user_2_language, 'translate')
-            message = {'user': 'User 1', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 1',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_1_language,
-                target_language=user_2_language
-            ))
-            session.commit()
+            submit_message('User 1', text1, 'translate')
             st.rerun()
 
     with right_col:
@@ -361,24 +549,46 @@ with tab3:
         st.markdown(f'{user_2_language}')
         text2 = st.text_input('User 2 text', placeholder=f'Enter text {enter_text}', label_visibility='collapsed')
         if st.button(label=f'Translate {script_map[script]["translate"]}', key='translate2-text') and text2:
-            with st.spinner(f'Translating... 正在{script_map[script]["translate"]}...'):
-                raw, translated = transcribe_and_translate(text2, user_2_language, user_1_language, 'translate')
-            message = {'user': 'User 2', 'raw_text': raw, 'translated_text': translated}
-            st.session_state['messages'].append(message)
-            session.add(Message(
-                user='User 2',
-                raw_text=raw,
-                translated_text=translated,
-                source_language=user_2_language,
-                target_language=user_1_language
-            ))
-            session.commit()
+            submit_message('User 2', text2, 'translate')
             st.rerun()
 
 st.markdown('---')
 
-if st.button('Clear 清除'):
-    st.session_state['messages'] = []
-    session.query(Message).delete()
-    session.commit()
-    st.rerun()
+clear_col, retranslate_col = st.columns(2)
+
+with clear_col:
+    if st.button('Clear 清除'):
+        st.session_state['messages'] = []
+        st.session_state['has_earlier'] = False
+        if SERVICE_URL:
+            get_pipeline().delete_conversation(conversation_id)
+            get_pipeline().forget_prompt(conversation_id)
+        else:
+            delete_conversation(conversation_id)
+            forget_prompt(conversation_id)
+        st.rerun()
+
+with retranslate_col:
+    if st.button(f"Re-translate 重新{script_map[script]['translate']}",
+                 help='Translate the whole conversation again with the current languages and engine.'):
+        retranslate = get_pipeline().retranslate_conversation if SERVICE_URL else retranslate_conversation
+        with st.spinner(f"Translating... 正在{script_map[script]['translate']}..."):
+            retranslate(conversation_id, user_1_language, user_2_language, script, translation_backend)
+        # reload the first page of history with the new translations
+        st.session_state.pop('messages', None)
+        st.rerun()
+
+
+@st.cache_resource
+def prewarm_asr() -> threading.Thread:
+    """
+    Load the Whisper model on a background thread once per process, after the first page has been sent.
+    :return: The thread doing the loading.
+    """
+    thread = threading.Thread(target=asr_model, name='asr-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+if os.getenv('ASR_PREWARM', '0') == '1' and SERVICE_URL is None:
+    prewarm_asr()
@@ -0,0 +1,481 @@
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+
+import tracing
+
+# openai and httpx are imported when a backend is created so that listing the backends stays cheap
+
+
+class TranslationBackend:
+    """
+    Interface implemented by every translation backend.
+    """
+    name = 'base'
+
+    def translate(self, raw_text: str, source_language: str, target_language: str, system_prompt: str) -> str:
+        """
+        Translate a single message.
+        :param raw_text: The text to be translated.
+        :param source_language: A string corresponding to the source language from which the text is to be translated.
+        :param target_language: A string corresponding to the target language into which the text is to be translated.
+        :param system_prompt: The conversation-level translation instructions. Backends that cannot follow free-form
+        instructions may ignore it.
+        :return: The translated text.
+        """
+        raise NotImplementedError
+
+    def translate_stream(self, raw_text: str, source_language: str, target_language: str,
+                         system_prompt: str) -> Iterator[str]:
+        """
+        Translate a single message, yielding the output in pieces as it becomes available.
+        Backends without incremental output yield the whole translation at once.
+        :return: An iterator over pieces of the translated text.
+        """
+        yield self.translate(raw_text, source_language, target_language, system_prompt)
+
+    def translate_batch(self, texts: list[str], source_language: str, target_language: str,
+                        system_prompt: str) -> list[str]:
+        """
+        Translate several messages that share a language pair.
+        :return: A list of translated texts in the same order as `texts`.
+        """
+        return [self.translate(text, source_language, target_language, system_prompt) for text in texts]
+
+
+def user_message(raw_text: str, source_language: str, target_language: str) -> dict:
+    """
+    Build the chat message asking for a translation.
+    :return: A dict containing the user role and the request.
+    """
+    return {
+        "role": "user",
+        "content": f"Translate the following message from {source_language} to {target_language}: {raw_text}"
+    }
+
+
+# static instructions for packed requests; they follow the conversation's system prompt so both stay a cacheable prefix
+BATCH_INSTRUCTIONS = (
+    'You will receive a JSON object with a source language, a target language, and a list of messages, each with an '
+    'id. Translate every message independently from the source language to the target language, following the '
+    'instructions above. Reply with a JSON object whose "translations" list contains one entry per message, with the '
+    'same id and its translation.'
+)
+
+BATCH_RESPONSE_FORMAT = {
+    'type': 'json_schema',
+    'json_schema': {
+        'name': 'translations',
+        'strict': True,
+        'schema': {
+            'type': 'object',
+            'properties': {
+                'translations': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {'id': {'type': 'integer'}, 'translation': {'type': 'string'}},
+                        'required': ['id', 'translation'],
+                        'additionalProperties': False
+                    }
+                }
+            },
+            'required': ['translations'],
+            'additionalProperties': False
+        }
+    }
+}
+
+
+def record_usage(usage) -> None:
+    """
+    Record the token usage of a chat completion on the active trace and in the process-wide counters.
+    :param usage: The `usage` field of a completion.
+    """
+    tracing.annotate(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    tracing.count('llm_prompt_tokens', usage.prompt_tokens)
+    tracing.count('llm_completion_tokens', usage.completion_tokens)
+
+
+class OpenAIBackend(TranslationBackend):
+    """
+    Chat completions backend with a pooled HTTP client, timeouts, retries, and a concurrency cap.
+
+    Requests share one keep-alive connection pool, at most `max_in_flight` requests run at once across every caller in
+    the process, 429 and 5xx responses are retried with jittered exponential backoff, and identical requests issued
+    while one is already in flight wait for and share its result. Batches are packed up to `batch_size` messages per
+    request with structured JSON output, so the system prompt is sent once per batch instead of once per message.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        model: str = 'gpt-4o-mini',
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        max_in_flight: int = 16,
+        max_connections: int = 32,
+        batch_size: int = 20
+    ):
+        """
+        :param api_key: The OpenAI API key.
+        :param base_url: An optional base URL, e.g. a local stub server. Defaults to the OpenAI API.
+        :param model: A string corresponding to the chat model.
+        :param timeout: The overall timeout for a single request attempt in seconds.
+        :param connect_timeout: The timeout for establishing a connection in seconds.
+        :param max_retries: The number of retries after the first attempt for retryable errors.
+        :param backoff_base: The base delay of the exponential backoff in seconds.
+        :param backoff_max: The maximum delay between attempts in seconds.
+        :param max_in_flight: The maximum number of concurrent requests.
+        :param max_connections: The size of the HTTP connection pool.
+        :param batch_size: The maximum number of messages packed into one request by translate_batch.
+        """
+        import httpx
+        import openai
+
+        self.model = model
+        self.name = f'openai:{model}'
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+
+        self.retryable_errors = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+            )
+        )
+
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Compute how long to wait before retrying, honoring a Retry-After header when the server sends one.
+        :param attempt: The zero-based number of the attempt that failed.
+        :param error: The error raised by that attempt.
+        :return: The delay in seconds.
+        """
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _create(self, messages: list[dict], stream: bool = False, **options):
+        """
+        Send a chat completions request, retrying retryable errors, while holding an in-flight slot.
+        :param messages: The chat messages.
+        :param stream: If true, request a streamed response.
+        :param options: Extra request parameters, e.g. `response_format`.
+        :return: The completion, or a stream of completion chunks.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._lock:
+                    self.requests += 1
+                with tracing.span('llm_request', model=self.model, attempt=attempt, stream=stream):
+                    if stream:
+                        # the final chunk then carries the token usage
+                        return self.client.chat.completions.create(
+                            model=self.model, messages=messages, stream=True, stream_options={'include_usage': True},
+                            **options
+                        )
+                    return self.client.chat.completions.create(model=self.model, messages=messages, **options)
+            except self.retryable_errors as error:
+                if attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, error))
+
+    def complete(self, messages: list[dict], **options) -> str:
+        """
+        Get the full completion for a list of chat messages.
+        :param messages: The chat messages.
+        :param options: Extra request parameters, e.g. `response_format`.
+        :return: The stripped content of the response.
+        """
+        request = json.dumps([self.model, messages, options], ensure_ascii=False, sort_keys=True)
+        key = hashlib.sha256(request.encode('utf-8')).hexdigest()
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            with self._semaphore:
+                response = self._create(messages, **options)
+            if response.usage is not None:
+                record_usage(response.usage)
+            future.set_result(response.choices[0].message.content.strip())
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+        return future.result()
+
+    def stream(self, messages: list[dict]) -> Iterator[str]:
+        """
+        Stream the completion for a list of chat messages. Only establishing the stream is retried.
+        :param messages: The chat messages.
+        :return: An iterator over the content deltas as they arrive.
+        """
+        with self._semaphore:
+            response = self._create(messages, stream=True)
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, 'usage', None) is not None:
+                    record_usage(chunk.usage)
+
+    def translate(self, raw_text: str, source_language: str, target_language: str, system_prompt: str) -> str:
+        """
+        Translate a single message with the chat model.
+        """
+        system = {"role": "system", "content": system_prompt}
+        return self.complete([system, user_message(raw_text, source_language, target_language)])
+
+    def translate_stream(self, raw_text: str, source_language: str, target_language: str,
+                         system_prompt: str) -> Iterator[str]:
+        """
+        Translate a single message with the chat model, yielding content deltas as they arrive.
+        """
+        system = {"role": "system", "content": system_prompt}
+        return self.stream([system, user_message(raw_text, source_language, target_language)])
+
+    def translate_batch(self, texts: list[str], source_language: str, target_language: str,
+                        system_prompt: str) -> list[str]:
+        """
+        Translate several messages, packing up to `batch_size` of them into each request. The requests are sent
+        concurrently, still capped at `max_in_flight` across the process.
+        """
+        chunks = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(chunks) <= 1:
+            return [
+                translation for chunk in chunks
+                for translation in self._translate_packed(chunk, source_language, target_language, system_prompt)
+            ]
+
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.max_in_flight)) as executor:
+            # each request records its spans and token usage on the caller's trace
+            futures = [
+                executor.submit(
+                    contextvars.copy_context().run, self._translate_packed, chunk, source_language, target_language,
+                    system_prompt
+                )
+                for chunk in chunks
+            ]
+            return [translation for future in futures for translation in future.result()]
+
+    def _translate_packed(self, texts: list[str], source_language: str, target_language: str,
+                          system_prompt: str) -> list[str]:
+        """
+        Translate a batch of messages in a single request with structured JSON output. Messages missing from the
+        reply are translated on their own.
+        :return: A list of translated texts in the same order as `texts`.
+        """
+        if len(texts) == 1:
+            return [self.translate(texts[0], source_language, target_language, system_prompt)]
+
+        payload = json.dumps({
+            'source_language': source_language,
+            'target_language': target_language,
+            'messages': [{'id': i, 'text': text} for i, text in enumerate(texts)]
+        }, ensure_ascii=False)
+
+        # the conversation's system prompt first and the static instructions second, so that repeated batches share
+        # the longest possible prompt prefix
+        content = self.complete([
+            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": BATCH_INSTRUCTIONS},
+            {"role": "user", "content": payload}
+        ], response_format=BATCH_RESPONSE_FORMAT)
+
+        try:
+            by_id = {item['id']: item['translation'].strip() for item in json.loads(content)['translations']}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            by_id = {}
+
+        return [
+            by_id[i] if by_id.get(i) else self.translate(text, source_language, target_language, system_prompt)
+            for i, text in enumerate(texts)
+        ]
+
+    def stats(self) -> dict:
+        """
+        Summarize backend usage.
+        :return: A dict containing request, retry and coalescing counters and the number of requests in flight.
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight)
+            }
+
+
+def language_code(language: str) -> str:
+    """
+    Map one of the app's language labels to an NLLB language code.
+    :param language: A language label such as 'Cantonese 粤语' or 'English 英文'.
+    :return: 'yue_Hant' for Cantonese, otherwise 'eng_Latn'.
+    """
+    return 'yue_Hant' if language.startswith('Cantonese') else 'eng_Latn'
+
+
+class LocalBackend(TranslationBackend):
+    """
+    Offline CPU translation with a CTranslate2-converted seq2seq model such as NLLB-200.
+
+    The model is loaded once (int8 by default) and inputs are translated in batches. Free-form instructions in the
+    system prompt are ignored; the language pair is passed to the model as language codes instead.
+    """
+
+    def __init__(
+        self,
+        model_dir: str,
+        tokenizer_name: str = 'facebook/nllb-200-distilled-600M',
+        compute_type: str = 'int8',
+        threads: int = 4,
+        max_batch_size: int = 32
+    ):
+        """
+        :param model_dir: A string corresponding to the directory of the CTranslate2 model.
+        :param tokenizer_name: The Hugging Face name or path of the model's tokenizer.
+        :param compute_type: The CTranslate2 compute type, e.g. 'int8' or 'float32'.
+        :param threads: The number of CPU threads used per translation.
+        :param max_batch_size: The maximum number of sentences translated in one batch.
+        """
+        try:
+            import ctranslate2
+            import transformers
+        except ImportError as error:
+            raise ImportError(
+                'The local translation backend requires ctranslate2, transformers and sentencepiece.'
+            ) from error
+
+        self.name = f'local:{os.path.basename(os.path.normpath(model_dir))}'
+        self.max_batch_size = max_batch_size
+        self.translator = ctranslate2.Translator(
+            model_dir, device='cpu', compute_type=compute_type, intra_threads=threads
+        )
+        self.tokenizer = transformers.AutoTokenizer.from_pretrained(tokenizer_name)
+        self._lock = threading.Lock()
+
+    def translate(self, raw_text: str, source_language: str, target_language: str, system_prompt: str) -> str:
+        """
+        Translate a single message with the local model.
+        """
+        return self.translate_batch([raw_text], source_language, target_language, system_prompt)[0]
+
+    def translate_batch(self, texts: list[str], source_language: str, target_language: str,
+                        system_prompt: str) -> list[str]:
+        """
+        Translate several messages in batched calls to the local model.
+        """
+        if not texts:
+            return []
+
+        target = language_code(target_language)
+
+        # the tokenizer's source language is shared state, so tokenization is serialized
+        with self._lock:
+            self.tokenizer.src_lang = language_code(source_language)
+            sources = [self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text)) for text in texts]
+
+        with tracing.span('local_translate', model=self.name, batch=len(sources)):
+            results = self.translator.translate_batch(
+                sources,
+                target_prefix=[[target]] * len(sources),
+                max_batch_size=self.max_batch_size
+            )
+
+        return [
+            self.tokenizer.decode(
+                self.tokenizer.convert_tokens_to_ids(result.hypotheses[0][1:]), skip_special_tokens=True
+            ).strip()
+            for result in results
+        ]
+
+
+BACKENDS = {
+    'openai': 'OpenAI GPT-4o-mini',
+    'local': 'Local offline model'
+}
+
+_backends = {}
+_backend_lock = threading.Lock()
+
+
+def get_backend(name: str | None = None) -> TranslationBackend:
+    """
+    Return a process-wide translation backend, creating it from environment variables on first use.
+    :param name: A key of BACKENDS. Defaults to the TRANSLATION_BACKEND environment variable, or 'openai'.
+    :return: The shared backend.
+    """
+    name = name or os.getenv('TRANSLATION_BACKEND', 'openai')
+
+    with _backend_lock:
+        if name not in _backends:
+            if name == 'openai':
+                _backends[name] = OpenAIBackend(
+                    api_key=os.getenv('OPENAI_API_KEY_TRANSLATE'),
+                    base_url=os.getenv('OPENAI_BASE_URL'),
+                    timeout=float(os.getenv('TRANSLATE_TIMEOUT_SECONDS', '30')),
+                    max_retries=int(os.getenv('TRANSLATE_MAX_RETRIES', '4')),
+                    max_in_flight=int(os.getenv('TRANSLATE_MAX_IN_FLIGHT', '16')),
+                    batch_size=int(os.getenv('TRANSLATE_BATCH_SIZE', '20'))
+                )
+            elif name == 'local':
+                _backends[name] = LocalBackend(
+                    model_dir=os.getenv('LOCAL_MT_MODEL_DIR', 'nllb-200-distilled-600M-ct2'),
+                    tokenizer_name=os.getenv('LOCAL_MT_TOKENIZER', 'facebook/nllb-200-distilled-600M'),
+                    threads=int(os.getenv('LOCAL_MT_THREADS', '4'))
+                )
+            else:
+                raise ValueError(f'Unknown translation backend: {name}')
+        return _backends[name]
+
+
+def backend_stats() -> dict:
+    """
+    Summarize usage of every translation backend created so far in this process.
+    :return: A dict mapping each backend name to its stats, for backends that report any.
+    """
+    with _backend_lock:
+        return {name: backend.stats() for name, backend in _backends.items() if hasattr(backend, 'stats')}
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import Column, Float, Integer, String
+
+from database import Base, Session
+
+
+class CachedTranslation(Base):
+    __tablename__ = 'translation_cache'
+    key = Column(String, primary_key=True)
+    translated_text = Column(String)
+    created_at = Column(Float, index=True)
+    last_used_at = Column(Float, index=True)
+    hits = Column(Integer, default=0)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize a message so trivially different spellings of the same phrase share a cache entry.
+    :param text: The raw message text.
+    :return: The text NFKC-normalized, case-folded, and with whitespace collapsed.
+    """
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip().casefold()
+
+
+def cache_key(raw_text: str, source_language: str, target_language: str, script: str, system_prompt: str,
+              backend: str) -> str:
+    """
+    Build the cache key for a translation request.
+    :param raw_text: The text to be translated.
+    :param source_language: A string corresponding to the source language.
+    :param target_language: A string corresponding to the target language.
+    :param script: A string corresponding to the selected Chinese script.
+    :param system_prompt: The system prompt sent with the request. Only its hash is part of the key.
+    :param backend: A string identifying the translation backend and model.
+    :return: A hex digest identifying the request.
+    """
+    prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+    parts = [normalize_text(raw_text), source_language, target_language, script, prompt_hash, backend]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+# keys per IN query, below SQLite's default limit of 999 bound parameters
+LOOKUP_BATCH = 500
+
+
+class TranslationCache:
+    """
+    Persistent translation cache stored in the app's SQLite database.
+
+    Entries expire after `ttl_seconds`, and once there are more than `max_entries` the least recently used entries are
+    evicted. A disabled cache never returns or stores anything.
+
+    Lookups only read from the database. Their access stamps are kept in memory and written in one transaction
+    together with eviction, which runs every `evict_every` stores, so the cache stays off the database's write lock
+    except when storing.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30 * 24 * 3600,
+        max_entries: int = 10000,
+        enabled: bool = True,
+        evict_every: int = 100
+    ):
+        """
+        :param ttl_seconds: How long a cached translation stays valid, in seconds.
+        :param max_entries: The maximum number of cached translations, exceeded by at most `evict_every` between
+            evictions.
+        :param enabled: If false, every lookup misses and nothing is stored.
+        :param evict_every: The number of stores between evictions of expired and excess entries.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.evict_every = evict_every
+        self._lock = threading.Lock()
+        # key -> (last used time, hits) of entries read since the last eviction
+        self._touched = {}
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, raw_text: str, source_language: str, target_language: str, script: str, system_prompt: str,
+            backend: str) -> str | None:
+        """
+        Look up a cached translation.
+        :return: The cached translated text, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+
+        key = cache_key(raw_text, source_language, target_language, script, system_prompt, backend)
+        now = time.time()
+
+        with Session() as session:
+            entry = session.get(CachedTranslation, key)
+            if entry is None or now - entry.created_at > self.ttl_seconds:
+                with self._lock:
+                    self.misses += 1
+                return None
+            translated_text = entry.translated_text
+
+        with self._lock:
+            self.hits += 1
+            _, hits = self._touched.get(key, (now, 0))
+            self._touched[key] = (now, hits + 1)
+        return translated_text
+
+    def get_many(self, raw_texts: list[str], source_language: str, target_language: str, script: str,
+                 system_prompt: str, backend: str) -> list[str | None]:
+        """
+        Look up the cached translations of several texts sharing a language pair in one query per `LOOKUP_BATCH` texts.
+        :return: A list of cached translated texts, or None for misses, in the same order as `raw_texts`.
+        """
+        if not self.enabled:
+            return [None] * len(raw_texts)
+
+        keys = [cache_key(raw_text, source_language, target_language, script, system_prompt, backend)
+                for raw_text in raw_texts]
+        now = time.time()
+
+        found = {}
+        with Session() as session:
+            unique = list(dict.fromkeys(keys))
+            for i in range(0, len(unique), LOOKUP_BATCH):
+                rows = session.query(
+                    CachedTranslation.key, CachedTranslation.translated_text, CachedTranslation.created_at
+                ).filter(CachedTranslation.key.in_(unique[i:i + LOOKUP_BATCH]))
+                found.update(
+                    (row.key, row.translated_text) for row in rows if now - row.created_at <= self.ttl_seconds
+                )
+
+        translations = [found.get(key) for key in keys]
+        with self._lock:
+            for key, translated_text in zip(keys, translations):
+                if translated_text is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                _, hits = self._touched.get(key, (now, 0))
+                self._touched[key] = (now, hits + 1)
+        return translations
+
+    def put(self, raw_text: str, source_language: str, target_language: str, script: str, system_prompt: str,
+            backend: str, translated_text: str) -> None:
+        """
+        Store a translation, evicting expired or excess entries every `evict_every` stores.
+        """
+        if not self.enabled:
+            return
+
+        key = cache_key(raw_text, source_language, target_language, script, system_prompt, backend)
+        now = time.time()
+
+        with Session() as session:
+            session.merge(CachedTranslation(
+                key=key,
+                translated_text=translated_text,
+                created_at=now,
+                last_used_at=now,
+                hits=0
+            ))
+            with self._lock:
+                self._puts += 1
+                evict = self._puts % self.evict_every == 0
+            if evict:
+                self._evict(session, now)
+            session.commit()
+
+    def _evict(self, session, now: float) -> None:
+        """
+        Write the access stamps gathered since the last eviction, then delete expired and least recently used entries.
+        :param session: The open session of the store that triggered the eviction. The caller commits.
+        :param now: The current time.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        for key, (last_used_at, hits) in touched.items():
+            session.query(CachedTranslation).filter(CachedTranslation.key == key).update(
+                {'last_used_at': last_used_at, 'hits': CachedTranslation.hits + hits}, synchronize_session=False
+            )
+
+        session.query(CachedTranslation).filter(CachedTranslation.created_at < now - self.ttl_seconds).delete()
+
+        excess = session.query(CachedTranslation).count() - self.max_entries
+        if excess > 0:
+            oldest = [
+                row.key for row in
+                session.query(CachedTranslation.key).order_by(CachedTranslation.last_used_at).limit(excess)
+            ]
+            session.query(CachedTranslation).filter(CachedTranslation.key.in_(oldest)).delete()
+
+    def clear(self) -> None:
+        """
+        Delete every cached translation.
+        """
+        with self._lock:
+            self._touched.clear()
+        with Session() as session:
+            session.query(CachedTranslation).delete()
+            session.commit()
+
+    def stats(self) -> dict:
+        """
+        Summarize cache usage since the process started.
+        :return: A dict containing hit/miss counters and the hit rate.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total > 0 else 0.0}
+
+
+translation_cache = TranslationCache(
+    ttl_seconds=float(os.getenv('TRANSLATION_CACHE_TTL_SECONDS', 30 * 24 * 3600)),
+    max_entries=int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '10000')),
+    enabled=os.getenv('TRANSLATION_CACHE_ENABLED', '1') == '1',
+    evict_every=int(os.getenv('TRANSLATION_CACHE_EVICT_EVERY', '100'))
+)
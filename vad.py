@@ -0,0 +1,154 @@
+import numpy as np
+
+from audio_utils import SAMPLE_RATE, pcm16_to_float32
+
+FRAME_SAMPLES = 480  # 30 ms at 16 kHz
+
+# energy thresholds in dBFS
+FLOOR_DB = -50.0
+CEILING_DB = -35.0
+MARGIN_DB = 12.0
+
+
+def frame_energies(audio: np.ndarray) -> np.ndarray:
+    """
+    Compute the RMS energy of consecutive 30 ms frames.
+    :param audio: A float32 waveform sampled at 16 kHz.
+    :return: A NumPy array containing the energy of each complete frame in dBFS.
+    """
+    n_frames = len(audio) // FRAME_SAMPLES
+    frames = audio[:n_frames * FRAME_SAMPLES].reshape(n_frames, FRAME_SAMPLES)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1) + 1e-12)
+    return 20 * np.log10(rms)
+
+
+def speech_threshold(noise_db: float) -> float:
+    """
+    Derive the speech/silence threshold from an estimate of the background noise level.
+    :param noise_db: The estimated noise floor in dBFS.
+    :return: The threshold in dBFS above which a frame counts as speech.
+    """
+    return min(max(noise_db + MARGIN_DB, FLOOR_DB), CEILING_DB)
+
+
+def speech_segments(
+    audio: np.ndarray,
+    min_silence_seconds: float = 0.5,
+    pad_seconds: float = 0.2,
+    max_segment_seconds: float | None = 30.0
+) -> list[tuple[int, int]]:
+    """
+    Find the regions of a waveform that contain speech.
+    :param audio: A float32 waveform sampled at 16 kHz.
+    :param min_silence_seconds: Pauses shorter than this are kept inside a segment.
+    :param pad_seconds: The amount of audio kept on either side of each segment so word onsets are not clipped.
+    :param max_segment_seconds: If given, longer segments are split at their quietest frame to fit this length.
+    :return: A list of (start, end) sample offsets, one per speech segment.
+    """
+    energies = frame_energies(audio)
+    if len(energies) == 0:
+        return []
+
+    threshold = speech_threshold(float(np.percentile(energies, 10)))
+    speech = np.flatnonzero(energies > threshold)
+    if len(speech) == 0:
+        return []
+
+    frame_seconds = FRAME_SAMPLES / SAMPLE_RATE
+    max_gap = int(min_silence_seconds / frame_seconds)
+    pad = int(pad_seconds / frame_seconds)
+    max_frames = int(max_segment_seconds / frame_seconds) if max_segment_seconds is not None else None
+
+    # group speech frames into runs, bridging pauses shorter than max_gap
+    breaks = np.flatnonzero(np.diff(speech) > max_gap + 1)
+    starts = np.concatenate([[speech[0]], speech[breaks + 1]])
+    ends = np.concatenate([speech[breaks], [speech[-1]]]) + 1
+
+    segments = []
+    for start, end in zip(starts, ends):
+        start = max(int(start) - pad, 0)
+        end = min(int(end) + pad, len(energies))
+
+        if max_frames is not None:
+            while end - start > max_frames:
+                search_from = start + max_frames * 3 // 4
+                cut = search_from + int(np.argmin(energies[search_from:start + max_frames]))
+                segments.append((start, cut))
+                start = cut
+
+        segments.append((start, end))
+
+    # merge segments whose padding now overlaps
+    merged = [segments[0]]
+    for start, end in segments[1:]:
+        if start <= merged[-1][1] and (max_frames is None or end - merged[-1][0] <= max_frames):
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+
+    last_sample = len(audio)
+    return [
+        (start * FRAME_SAMPLES, last_sample if end == len(energies) else end * FRAME_SAMPLES)
+        for start, end in merged
+    ]
+
+
+def trim_silence(audio: np.ndarray, min_silence_seconds: float = 0.5, pad_seconds: float = 0.2) -> np.ndarray:
+    """
+    Cut leading, trailing and long internal silences out of a waveform before decoding.
+    :param audio: A float32 waveform sampled at 16 kHz.
+    :param min_silence_seconds: Pauses shorter than this are left untouched.
+    :param pad_seconds: The amount of audio kept around each stretch of speech.
+    :return: The waveform with silences removed, or the original waveform if no speech was detected.
+    """
+    segments = speech_segments(audio, min_silence_seconds, pad_seconds, max_segment_seconds=None)
+    if not segments:
+        return audio
+    return np.concatenate([audio[start:end] for start, end in segments])
+
+
+class EndpointDetector:
+    """
+    Detect the end of an utterance in a live 16 kHz int16 stream so recording can stop once the speaker does.
+
+    The noise floor is tracked from frames classified as silence, and the endpoint is reached once some speech has been
+    heard and is followed by `silence_seconds` of silence.
+    """
+
+    def __init__(self, silence_seconds: float = 1.0, min_speech_seconds: float = 0.3):
+        """
+        :param silence_seconds: The amount of trailing silence in seconds that ends the utterance.
+        :param min_speech_seconds: The amount of speech in seconds required before an endpoint can be reached.
+        """
+        frame_seconds = FRAME_SAMPLES / SAMPLE_RATE
+        self.silence_frames_needed = int(silence_seconds / frame_seconds)
+        self.speech_frames_needed = int(min_speech_seconds / frame_seconds)
+
+        self.noise_db = None
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self._remainder = np.zeros(0, dtype=np.float32)
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Process a captured chunk of audio.
+        :param chunk: Raw int16 audio bytes.
+        :return: True if the speaker has finished talking, otherwise False.
+        """
+        audio = np.concatenate([self._remainder, pcm16_to_float32(chunk)])
+        n_samples = len(audio) // FRAME_SAMPLES * FRAME_SAMPLES
+        self._remainder = audio[n_samples:]
+
+        for energy in frame_energies(audio[:n_samples]):
+            if self.noise_db is None:
+                self.noise_db = float(energy)
+
+            if energy > speech_threshold(self.noise_db):
+                self.speech_frames += 1
+                self.silence_frames = 0
+            else:
+                self.noise_db = 0.95 * self.noise_db + 0.05 * float(energy)
+                if self.speech_frames > 0:
+                    self.silence_frames += 1
+
+        return self.speech_frames >= self.speech_frames_needed and self.silence_frames >= self.silence_frames_needed